@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+
+# Read throughput of compressed input (gzip, bz2, xz) against plain text
+#
+#   python benchmarks/bench_compressed.py
+#   python benchmarks/bench_compressed.py --natoms 100000 --frames 200
+#
+# POSCAR: one read_vasp call. XDATCAR: a full pass over the frames of a
+# Trajectory, with the peak memory of the pass to show it does not grow with
+# the number of frames. Rates are in MB of uncompressed text per second.
+
+import argparse
+import bz2
+import gzip
+import lzma
+import os
+import shutil
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+from vaspfileinspector import reader, trajectory
+
+COMPRESSORS = (("gzip", ".gz", gzip.open), ("bz2", ".bz2", bz2.open), ("xz", ".xz", lzma.open))
+
+
+def write_poscar(name, natoms, seed=0):
+    rng = np.random.default_rng(seed)
+    a = 2.7 * natoms ** (1.0 / 3.0)
+    with open(name, 'w') as out:
+        out.write("Si O benchmark\n1.0\n")
+        out.write("%f 0.0 0.0\n0.0 %f 0.0\n0.0 0.0 %f\n" % (a, a, a))
+        out.write("Si O\n%i %i\nDirect\n" % (natoms // 3, natoms - natoms // 3))
+        out.write(("%.16f %.16f %.16f\n" * natoms) % tuple(rng.random((natoms, 3)).ravel()))
+
+
+def write_xdatcar(name, natoms, nframes, seed=0):
+    rng = np.random.default_rng(seed)
+    a = 2.7 * natoms ** (1.0 / 3.0)
+    xs = rng.random((natoms, 3))
+    with open(name, 'w') as out:
+        out.write("Si O benchmark\n1.0\n")
+        out.write("%f 0.0 0.0\n0.0 %f 0.0\n0.0 0.0 %f\n" % (a, a, a))
+        out.write("Si O\n%i %i\n" % (natoms // 3, natoms - natoms // 3))
+        for k in range(nframes):
+            xs = (xs + 0.001 * rng.standard_normal(xs.shape)) % 1.0
+            out.write("Direct configuration=%6i\n" % (k + 1))
+            out.write(("%.8f %.8f %.8f\n" * natoms) % tuple(xs.ravel()))
+
+
+def compress(name, suffix, opener):
+    with open(name, 'rb') as src, opener(name + suffix, 'wb') as dst:
+        shutil.copyfileobj(src, dst, 1 << 20)
+    return name + suffix
+
+
+def read_all(name):
+    with trajectory.Trajectory(name) as traj:
+        for frame in traj:
+            pass
+    return len(traj)
+
+
+# best time of repeat runs, the peak memory from one more traced run
+def timed(func, name, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func(name)
+        times.append(time.perf_counter() - t0)
+    tracemalloc.start()
+    func(name)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return min(times), peak
+
+
+def report(kind, label, name, mb, func, repeat, base=None):
+    seconds, peak = timed(func, name, repeat)
+    ratio = mb * 1e6 / os.path.getsize(name)
+    print("%-8s %-6s %10.2f %8.1f %10.4f %10.1f %10.1f %8s" %
+          (kind, label, mb, ratio, seconds, mb / seconds, peak / 1e6,
+           "%.2f" % (seconds / base) if base else "-"))
+    return seconds
+
+
+def main():
+    cli = argparse.ArgumentParser(description="compressed input read throughput")
+    cli.add_argument("--natoms", type=int, default=50000, help="atoms in the POSCAR and per XDATCAR frame")
+    cli.add_argument("--frames", type=int, nargs="+", default=[20, 80], help="XDATCAR frame counts")
+    cli.add_argument("--repeat", type=int, default=3)
+    args = cli.parse_args()
+
+    print("%-8s %-6s %10s %8s %10s %10s %10s %8s" %
+          ("file", "codec", "MB", "ratio", "time (s)", "MB/s", "peak (MB)", "vs plain"))
+    with tempfile.TemporaryDirectory() as tmp:
+        name = os.path.join(tmp, "POSCAR")
+        write_poscar(name, args.natoms)
+        mb = os.path.getsize(name) / 1e6
+        base = report("POSCAR", "plain", name, mb, reader.read_vasp, args.repeat)
+        for label, suffix, opener in COMPRESSORS:
+            report("POSCAR", label, compress(name, suffix, opener), mb, reader.read_vasp, args.repeat, base)
+
+        for nframes in args.frames:
+            name = os.path.join(tmp, "XDATCAR-%i" % nframes)
+            write_xdatcar(name, args.natoms, nframes)
+            mb = os.path.getsize(name) / 1e6
+            kind = "XDAT%i" % nframes
+            base = report(kind, "plain", name, mb, read_all, args.repeat)
+            for label, suffix, opener in COMPRESSORS:
+                report(kind, label, compress(name, suffix, opener), mb, read_all, args.repeat, base)
+
+
+if __name__ == "__main__":
+    main()
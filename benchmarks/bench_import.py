@@ -0,0 +1,154 @@
+# -*- coding: utf-8 -*-
+
+# Startup cost of the vfi command line
+#
+#   python benchmarks/bench_import.py
+#   python benchmarks/bench_import.py --budget 100 --structure POSCAR
+#
+# Every case runs in a fresh interpreter. Reported are the best wall time of
+# the whole process and the cumulative import time of vaspfileinspector.cli
+# from -X importtime. The script also checks which heavy modules each case
+# loaded and exits with status 1 when the import of the cli goes over the
+# budget, a light option pulls in a module it does not need, or a case
+# fails or does not print what it should, so it can guard the startup path
+# in CI.
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+# modules a case must not load
+HEAVY = ("spglib", "vaspfileinspector.neighbors", "vaspfileinspector.rdf",
+         "vaspfileinspector.topology", "vaspfileinspector.parallel", "numpy")
+
+RUN = """
+import sys
+sys.argv = ["vfi"] + %r
+from vaspfileinspector import cli
+code = 0
+try:
+    cli.main()
+except SystemExit as e:
+    code = e.code or 0
+sys.stdout.flush()
+sys.stderr.write("\\nLOADED " + " ".join(m for m in %r if m in sys.modules) + "\\n")
+sys.exit(code)
+"""
+
+BC8 = """Si16
+1.0
+6.655650 0.000000 0.000000
+0.000000 6.655650 0.000000
+0.000000 0.000000 6.655650
+Si
+16
+Direct
+0.101557 0.101557 0.101557
+0.398443 0.898443 0.601557
+0.898443 0.601557 0.398443
+0.601557 0.398443 0.898443
+0.898443 0.898443 0.898443
+0.601557 0.101557 0.398443
+0.101557 0.398443 0.601557
+0.398443 0.601557 0.101557
+0.601557 0.601557 0.601557
+0.898443 0.398443 0.101557
+0.398443 0.101557 0.898443
+0.101557 0.898443 0.398443
+0.398443 0.398443 0.398443
+0.101557 0.601557 0.898443
+0.601557 0.898443 0.101557
+0.898443 0.101557 0.601557
+"""
+
+
+# the children run in the temporary directory, a relative PYTHONPATH would
+# silently point them at nothing
+def environment():
+    env = dict(os.environ)
+    if env.get("PYTHONPATH"):
+        env["PYTHONPATH"] = os.pathsep.join(os.path.abspath(p) for p in env["PYTHONPATH"].split(os.pathsep))
+    return env
+
+
+def import_time(module):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import " + module],
+                         capture_output=True, text=True, check=True, env=environment()).stderr
+    for line in out.splitlines():
+        fields = line.split("|")
+        if len(fields) == 3 and fields[2].strip() == module:
+            return int(fields[1]) / 1000.0
+    return float("nan")
+
+
+# best wall time (ms), heavy modules loaded and an error, None when every
+# run exited with status 0 and printed expected on stdout
+def run(argv, repeat, code=RUN, expected=""):
+    best = float("inf")
+    loaded = []
+    error = None
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        proc = subprocess.run([sys.executable, "-c", code % (argv, HEAVY) if code == RUN else code],
+                              capture_output=True, text=True, cwd=tempfile.gettempdir(), env=environment())
+        best = min(best, time.perf_counter() - t0)
+        if proc.returncode != 0:
+            error = "status %i: %s" % (proc.returncode, (proc.stderr.strip().splitlines() or [""])[-1])
+        elif expected not in proc.stdout:
+            error = "no %r in the output" % expected
+        elif code == RUN and "\nLOADED" not in proc.stderr:
+            error = "did not finish"
+    for line in proc.stderr.splitlines():
+        if line.startswith("LOADED"):
+            loaded = line.split()[1:]
+    return best * 1000.0, loaded, error
+
+
+def main():
+    cli = argparse.ArgumentParser(description="vfi startup time")
+    cli.add_argument("--budget", type=float, default=100.0, help="import budget of vaspfileinspector.cli in ms")
+    cli.add_argument("--structure", default=None, help="structure file for the option cases (default: a built in BC8 cell)")
+    cli.add_argument("--repeat", type=int, default=5)
+    args = cli.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        name = args.structure
+        if name is None:
+            name = os.path.join(tmp, "POSCAR")
+            with open(name, "w") as out:
+                out.write(BC8)
+
+        # argv, modules the case may load, text it must print
+        cases = ((["--version"], (), "0.3.0"),
+                 (["--help"], (), "usage:"),
+                 (["--no-cache", "-a", name], ("numpy",), "/*-- Atoms --*/"),
+                 (["--no-cache", "-c", name], ("numpy", "spglib"), "/*-- Cell --*/"),
+                 (["--no-cache", "-b", name], ("numpy", "vaspfileinspector.neighbors"), "/*-- Bonds --*/"),
+                 ([name], ("numpy", "spglib", "vaspfileinspector.neighbors"), "/*-- Bonds --*/"))
+
+        failed = False
+        cli_ms = min(import_time("vaspfileinspector.cli") for i in range(args.repeat))
+        # nan when the module is missing from the import log
+        failed |= not cli_ms <= args.budget
+        status = "ok" if cli_ms <= args.budget else "OVER BUDGET"
+        print("import vaspfileinspector.cli  %8.1f ms  (budget %.0f ms) %s" % (cli_ms, args.budget, status))
+        print("python -c pass               %8.1f ms" % run([], args.repeat, "pass")[0])
+        print()
+        print("%-28s %10s  %s" % ("vfi", "wall (ms)", "heavy modules loaded"))
+        for argv, allowed, expected in cases:
+            ms, loaded, error = run(argv, args.repeat, expected=expected)
+            extra = [m for m in loaded if m not in allowed]
+            failed |= len(extra) > 0 or error is not None
+            shown = " ".join(a if a != name else "FILE" for a in argv)
+            print("%-28s %10.1f  %s%s%s" % (shown, ms, " ".join(loaded) or "-",
+                                            "  UNEXPECTED: " + " ".join(extra) if extra else "",
+                                            "  FAILED: " + error if error else ""))
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
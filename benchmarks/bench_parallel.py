@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+
+# Parallel neighbor search against the serial search
+#
+#   python benchmarks/bench_parallel.py
+#   python benchmarks/bench_parallel.py --sizes 1 8 18 --jobs 2 4 8 --radius 0 3
+#
+# The structure (BC8 silicon by default) is repeated n x n x n times and
+# Neighbors.find is timed with every number of jobs. That the lists are
+# identical to the serial one and that small cells stay serial is tested in
+# tests/test_parallel.py.
+
+import argparse
+import os
+import time
+import numpy as np
+
+from vaspfileinspector import reader, parallel
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+
+
+def supercell(H, x, species, n):
+    xs = np.dot(x, np.linalg.inv(H))
+    shifts = np.array([(a, b, c) for a in range(n) for b in range(n) for c in range(n)])
+    xs = ((xs[:, None, :] + shifts[None, :, :]) / float(n)).reshape(-1, 3)
+    Hn = np.asarray(H) * n
+    return Hn, np.dot(xs, Hn), list(np.repeat(species, len(shifts)))
+
+
+def timed(nn, x, lattice, species, rcut):
+    t0 = time.perf_counter()
+    nn.find(x, lattice, species, rcut)
+    return time.perf_counter() - t0
+
+
+def main():
+    cli = argparse.ArgumentParser(description="parallel neighbor search against the serial search")
+    cli.add_argument("--structure", default=BC8, help="unit cell to repeat (default: BC8-mp.poscar)")
+    cli.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 8, 18], help="supercell repeats n")
+    cli.add_argument("--jobs", type=int, nargs="+", default=[2, 4, 8, 32])
+    cli.add_argument("--radius", type=float, nargs="+", default=[0.0, 3.0], help="search radii, 0 = automatic")
+    args = cli.parse_args()
+
+    data = reader.read_vasp(args.structure)
+
+    print("%d cpus available\n" % parallel.available_cpus())
+    print("%8s %8s %6s %10s %10s %8s %8s" % ("natoms", "rcut", "jobs", "serial (s)", "time (s)", "speedup", "pool"))
+    for n in args.sizes:
+        H, x, species = supercell(data[0], data[1], data[2], n)
+        lattice = Lattice(H)
+        for rcut in args.radius:
+            serial = Neighbors(rcut)
+            tserial = timed(serial, x, lattice, species, rcut)
+            for jobs in args.jobs:
+                nn = Neighbors(rcut, jobs=jobs)
+                t = timed(nn, x, lattice, species, rcut)
+                print("%8i %8.2f %6i %10.4f %10.4f %8.2f %8s" % (len(x), serial.rcut, jobs, tserial, t, tserial / t,
+                                                               "no" if nn.parallel["serial"] else "%i" % nn.parallel["jobs"]))
+
+
+if __name__ == "__main__":
+    main()
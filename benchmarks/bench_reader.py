@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# Parse throughput of reader.read_vasp against the old line by line parser
+#
+#   python benchmarks/bench_reader.py
+#   python benchmarks/bench_reader.py --natoms 1000 100000 500000 --selective
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from vaspfileinspector import reader
+
+
+def write_poscar(name, natoms, selective=False, velocities=False, seed=0):
+    rng = np.random.default_rng(seed)
+    xs = rng.random((natoms, 3))
+    a = 2.7 * natoms ** (1.0 / 3.0)
+    with open(name, 'w') as out:
+        out.write("Si O benchmark\n1.0\n")
+        out.write("%f 0.0 0.0\n0.0 %f 0.0\n0.0 0.0 %f\n" % (a, a, a))
+        out.write("Si O\n%i %i\n" % (natoms // 3, natoms - natoms // 3))
+        if selective:
+            out.write("Selective dynamics\n")
+        out.write("Direct\n")
+        fmt = "%.16f %.16f %.16f" + (" T T F" if selective else "") + "\n"
+        out.write((fmt * natoms) % tuple(xs.ravel()))
+        if velocities:
+            out.write("\n" + ("%.8e %.8e %.8e\n" * natoms) % tuple(xs.ravel()))
+
+
+# reference: the parser as it was before the bulk coordinate read
+def read_vasp_lines(filename):
+    data = open(filename).readlines()
+    scale = float(data[1])
+    lattice = np.array([[float(x) for x in data[i].split()[:3]] for i in range(2, 5)]) * scale
+    try:
+        num_atoms = np.array([int(x) for x in data[5].split()])
+        line_at = 6
+    except ValueError:
+        num_atoms = np.array([int(x) for x in data[6].split()])
+        line_at = 7
+    if data[line_at][0].lower() == 's':
+        line_at += 1
+    line_at += 1
+    positions = []
+    for i in range(line_at, line_at + num_atoms.sum()):
+        positions.append([float(x) for x in data[i].split()[:3]])
+    return np.dot(positions, lattice)
+
+
+def best_of(func, name, repeat):
+    times = []
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        result = func(name)
+        times.append(time.perf_counter() - t0)
+    return min(times), result
+
+
+def main():
+    cli = argparse.ArgumentParser(description="read_vasp parse throughput")
+    cli.add_argument("--natoms", type=int, nargs="+", default=[1000, 10000, 100000, 300000])
+    cli.add_argument("--selective", action="store_true", help="write selective dynamics flags")
+    cli.add_argument("--velocities", action="store_true", help="append a velocity block")
+    cli.add_argument("--repeat", type=int, default=3)
+    args = cli.parse_args()
+
+    print("%10s %10s %12s %12s %12s %8s" % ("natoms", "MB", "bulk (s)", "lines (s)", "atoms/s", "speedup"))
+    with tempfile.TemporaryDirectory() as tmp:
+        for natoms in args.natoms:
+            name = os.path.join(tmp, "POSCAR-%i" % natoms)
+            write_poscar(name, natoms, args.selective, args.velocities)
+            mb = os.path.getsize(name) / 1e6
+
+            fast, data = best_of(reader.read_vasp, name, args.repeat)
+            slow, positions = best_of(read_vasp_lines, name, args.repeat)
+            assert np.array_equal(data[1], positions)
+
+            print("%10i %10.2f %12.4f %12.4f %12.3e %8.1f" %
+                  (natoms, mb, fast, slow, natoms / fast, slow / fast))
+
+
+if __name__ == "__main__":
+    main()
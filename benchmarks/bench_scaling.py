@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+
+# Scaling curves of the analysis stages, with JSON baselines
+#
+#   python benchmarks/bench_scaling.py
+#   python benchmarks/bench_scaling.py --save baseline.json
+#   python benchmarks/bench_scaling.py --compare baseline.json --threshold 0.25
+#   python benchmarks/bench_scaling.py --quick --families amorphous --stages parse neighbors-auto
+#
+# Two families of structures are generated: n x n x n supercells of BC8
+# silicon (BC8-mp.poscar, 16 to ~93k atoms) and amorphous boxes, a simple
+# cubic grid at the density of silicon with every atom displaced at random
+# by up to 15% of the spacing, which keeps atoms at least ~1.9 Å apart like
+# a real glass (8 to ~100k atoms). For every structure the stages
+#
+#   write            writer.write_poscar of the structure
+#   parse            reader.read_vasp of that file
+#   setup            Lattice and Atoms
+#   symmetry         spglib.get_symmetry_dataset (up to --symmetry-max atoms)
+#   neighbors-fixed  Neighbors.find with a fixed cutoff
+#   neighbors-auto   Neighbors.find with the automatic cutoff
+#   rdf              RDF.accumulate
+#
+# are timed (best of --repeat runs) and the scaling exponent k of t ~ N^k is
+# fitted per family and stage on the points above the timer noise floor.
+# --save writes the results as a JSON baseline, --compare checks a run
+# against one and exits with status 1 when a stage got slower than the
+# baseline by more than --threshold, so engine changes are judged on numbers.
+
+import argparse
+import json
+import os
+import platform
+import sys
+import tempfile
+import time
+import numpy as np
+import spglib
+
+from vaspfileinspector import reader, writer
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.atoms import Atoms
+from vaspfileinspector.neighbors import Neighbors
+from vaspfileinspector.rdf import RDF
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+
+STAGES = ("write", "parse", "setup", "symmetry", "neighbors-fixed", "neighbors-auto", "rdf")
+
+# supercell repeats and grid sizes, 16 .. 93312 and 8 .. 103823 atoms
+BC8_SIZES = (1, 2, 3, 5, 8, 12, 18)
+AMORPHOUS_SIZES = (2, 4, 8, 16, 32, 47)
+QUICK_BC8_SIZES = (1, 2, 3, 5, 8)
+QUICK_AMORPHOUS_SIZES = (2, 4, 8, 16, 24)
+
+# atoms per Å^3 of silicon, displacement of the amorphous grid in grid
+# spacings, fixed cutoffs and g(r) range (Å)
+DENSITY = 0.05
+JITTER = 0.15
+BC8_RCUT = 2.6
+AMORPHOUS_RCUT = 3.0
+RDF_RMAX = 5.0
+
+# times below this are timer noise and left out of the fits and checks
+NOISE_FLOOR = 2e-3
+
+
+def bc8_supercell(n):
+    data = reader.read_vasp(BC8)
+    H = np.asarray(data[0])
+    xs = np.dot(np.asarray(data[1]), np.linalg.inv(H))
+    shifts = np.array([(a, b, c) for a in range(n) for b in range(n) for c in range(n)])
+    xs = ((xs[:, None, :] + shifts[None, :, :]) / float(n)).reshape(-1, 3)
+    return H * n, xs, ["Si"] * len(xs)
+
+
+def amorphous_box(m, seed=0):
+    rng = np.random.default_rng(seed)
+    natoms = m ** 3
+    a = (natoms / DENSITY) ** (1.0 / 3.0)
+    grid = np.stack(np.meshgrid(np.arange(m), np.arange(m), np.arange(m), indexing='ij'), axis=-1).reshape(-1, 3)
+    xs = ((grid + 0.5 + rng.uniform(-JITTER, JITTER, grid.shape)) / m) % 1.0
+    return np.eye(3) * a, xs, ["Si"] * natoms
+
+
+def best_of(func, repeat):
+    best = float("inf")
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def run_structure(H, xs, symbols, rcut, stages, repeat, symmetry_max, tmp):
+    name = os.path.join(tmp, "POSCAR")
+    times = {}
+
+    times["write"] = best_of(lambda: writer.write_poscar(name, H, xs, symbols, "benchmark"), repeat)
+    data = reader.read_vasp(name)
+    times["parse"] = best_of(lambda: reader.read_vasp(name), repeat)
+
+    def setup():
+        lattice = Lattice(data[0])
+        return lattice, Atoms(lattice, None, data[2], data[1], data[4], data[3], fractional=False)
+    times["setup"] = best_of(setup, repeat)
+    lattice, atoms = setup()
+
+    if "symmetry" in stages and len(xs) <= symmetry_max:
+        cell = (lattice.H, atoms.xs, data[4])
+        times["symmetry"] = best_of(lambda: spglib.get_symmetry_dataset(cell, 0.05), repeat)
+    if "neighbors-fixed" in stages:
+        times["neighbors-fixed"] = best_of(lambda: Neighbors(rcut).find(atoms.x, lattice, data[2], rcut), repeat)
+    if "neighbors-auto" in stages:
+        times["neighbors-auto"] = best_of(lambda: Neighbors(0).find(atoms.x, lattice, data[2], 0), repeat)
+    if "rdf" in stages:
+        times["rdf"] = best_of(lambda: RDF(RDF_RMAX, 100).accumulate(atoms), repeat)
+
+    return dict((k, v) for k, v in times.items() if k in stages)
+
+
+# least squares slope of log t against log N
+def fit_exponent(natoms, seconds):
+    points = [(n, t) for n, t in zip(natoms, seconds) if t is not None and t >= NOISE_FLOOR]
+    if len(points) < 2:
+        return None
+    n, t = np.log(np.array(points)).T
+    return float(np.polyfit(n, t, 1)[0])
+
+
+def exponents(results):
+    fits = {}
+    for family in sorted(set(r["family"] for r in results)):
+        fits[family] = {}
+        for stage in STAGES:
+            rows = sorted((r["natoms"], r["seconds"]) for r in results if r["family"] == family and r["stage"] == stage)
+            if rows:
+                fits[family][stage] = fit_exponent(*zip(*rows))
+    return fits
+
+
+def run(families, stages, repeat, symmetry_max, quick):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        # first calls pay for lazy imports and caches, keep them out
+        run_structure(*bc8_supercell(1), BC8_RCUT, stages, 1, symmetry_max, tmp)
+        for family in families:
+            if family == "bc8":
+                sizes, make, rcut = (QUICK_BC8_SIZES if quick else BC8_SIZES), bc8_supercell, BC8_RCUT
+            else:
+                sizes, make, rcut = (QUICK_AMORPHOUS_SIZES if quick else AMORPHOUS_SIZES), amorphous_box, AMORPHOUS_RCUT
+            for n in sizes:
+                H, xs, symbols = make(n)
+                times = run_structure(H, xs, symbols, rcut, stages, repeat, symmetry_max, tmp)
+                print("%-10s %8i  %s" % (family, len(xs), "  ".join("%s %.4f" % (k, v) for k, v in times.items())))
+                sys.stdout.flush()
+                for stage, seconds in times.items():
+                    results.append({"family": family, "natoms": len(xs), "stage": stage, "seconds": seconds})
+    return results
+
+
+def show_exponents(fits, baseline=None):
+    print()
+    print("%-10s %-16s %10s %10s" % ("family", "stage", "exponent", "baseline"))
+    for family, stages in fits.items():
+        for stage, k in stages.items():
+            base = None
+            if baseline is not None:
+                base = baseline.get(family, {}).get(stage)
+            print("%-10s %-16s %10s %10s" % (family, stage, "%.2f" % k if k is not None else "-",
+                                             "%.2f" % base if base is not None else "-"))
+
+
+# stages slower than the baseline by more than threshold, same family,
+# size and stage and both above the noise floor
+def compare(results, baseline, threshold):
+    reference = dict(((r["family"], r["natoms"], r["stage"]), r["seconds"]) for r in baseline["results"])
+    slower = []
+    print()
+    print("%-10s %8s %-16s %10s %10s %8s" % ("family", "natoms", "stage", "time (s)", "base (s)", "ratio"))
+    for r in results:
+        base = reference.get((r["family"], r["natoms"], r["stage"]))
+        if base is None or max(base, r["seconds"]) < NOISE_FLOOR:
+            continue
+        ratio = r["seconds"] / base
+        flag = ratio > 1.0 + threshold
+        if flag:
+            slower.append(r)
+        print("%-10s %8i %-16s %10.4f %10.4f %8.2f%s" % (r["family"], r["natoms"], r["stage"],
+                                                       r["seconds"], base, ratio, "  SLOWER" if flag else ""))
+    return slower
+
+
+def main():
+    cli = argparse.ArgumentParser(description="scaling curves of the analysis stages")
+    cli.add_argument("--families", nargs="+", choices=["bc8", "amorphous"], default=["bc8", "amorphous"])
+    cli.add_argument("--stages", nargs="+", choices=STAGES, default=list(STAGES))
+    cli.add_argument("--repeat", type=int, default=3)
+    cli.add_argument("--quick", action="store_true", help="sizes up to ~14k atoms only")
+    cli.add_argument("--symmetry-max", type=int, default=10000, help="largest structure given to spglib")
+    cli.add_argument("--save", default=None, help="write the results to this JSON baseline")
+    cli.add_argument("--compare", default=None, help="JSON baseline to check the results against")
+    cli.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown against the baseline (0.25 = 25%%)")
+    args = cli.parse_args()
+
+    results = run(args.families, args.stages, args.repeat, args.symmetry_max, args.quick)
+    fits = exponents(results)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    show_exponents(fits, baseline["exponents"] if baseline else None)
+
+    if args.save:
+        with open(args.save, 'w') as out:
+            json.dump({"python": platform.python_version(), "numpy": np.__version__,
+                       "machine": platform.machine(), "processor": platform.processor(),
+                       "repeat": args.repeat, "results": results, "exponents": fits}, out, indent=1)
+        print("\nbaseline written to %s" % args.save)
+
+    if baseline is not None:
+        slower = compare(results, baseline, args.threshold)
+        if slower:
+            print("\n%i stage(s) slower than the baseline by more than %.0f%%" % (len(slower), 100 * args.threshold))
+            sys.exit(1)
+        print("\nno stage slower than the baseline by more than %.0f%%" % (100 * args.threshold))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# Per call latency of vfi against a warm vfi serve daemon
+#
+#   python benchmarks/bench_server.py
+#   python benchmarks/bench_server.py --calls 50 --args="-bc;-a -r 3" --structure POSCAR
+#
+# A daemon is started on a private socket and cache directory. For every
+# argument set three kinds of calls are timed (median of --calls):
+#
+#   cli      a new `vfi ...` process, what a workflow engine pays today
+#   client   a new `vfi --client ...` process talking to the daemon
+#   request  one request on the socket from this process, the daemon side
+#            of a client call without the interpreter start up
+#
+# The output of the client is checked to be the same as the CLI's.
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+from vaspfileinspector import server
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+
+VFI = [sys.executable, "-m", "vaspfileinspector.cli"]
+
+
+def call(argv, env):
+    t0 = time.perf_counter()
+    out = subprocess.run(VFI + argv, env=env, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, check=True).stdout
+    return time.perf_counter() - t0, out
+
+
+def request(path, argv):
+    t0 = time.perf_counter()
+    out = []
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        conn.connect(path)
+        conn.sendall(json.dumps({"argv": argv, "cwd": os.getcwd()}).encode() + b'\n')
+        with conn.makefile('rb') as f:
+            for kind, payload in server.read_frames(f):
+                if kind == server.STDOUT:
+                    out.append(payload)
+    return time.perf_counter() - t0, b"".join(out)
+
+
+def median(func, calls):
+    times = []
+    for i in range(calls):
+        seconds, out = func()
+        times.append(seconds)
+    return float(np.median(times)), out
+
+
+def wait_for(path, proc, timeout=60.0):
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < timeout:
+        if proc.poll() is not None:
+            raise RuntimeError("vfi serve exited with status %i" % proc.returncode)
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+            return time.perf_counter() - t0
+        except OSError:
+            time.sleep(0.02)
+    raise RuntimeError("vfi serve did not come up in %.0f s" % timeout)
+
+
+def main():
+    cli = argparse.ArgumentParser(description="latency of vfi calls against a warm vfi serve daemon")
+    cli.add_argument("--structure", default=BC8, help="structure file (default: BC8-mp.poscar)")
+    cli.add_argument("--args", default="-a;-bc;-bn;-gacnbo", help="argument sets separated by ; (default: %(default)s)")
+    cli.add_argument("--calls", type=int, default=20)
+    args = cli.parse_args()
+
+    structure = os.path.abspath(args.structure)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "vfi.sock")
+        env = dict(os.environ, VFI_SOCKET=path, VFI_CACHE_DIR=os.path.join(tmp, "cache"))
+        proc = subprocess.Popen(VFI + ["serve"], env=env)
+        try:
+            print("daemon up in %.2f s\n" % wait_for(path, proc))
+            print("%-12s %10s %10s %10s %8s" % ("args", "cli (ms)", "client", "request", "speedup"))
+            for a in args.args.split(";"):
+                argv = a.split() + [structure]
+                # first calls fill the caches, the steady state is timed
+                call(argv, env)
+                request(path, argv)
+                tcli, out = median(lambda: call(argv, env), args.calls)
+                tclient, cout = median(lambda: call(["--client"] + argv, env), args.calls)
+                treq, rout = median(lambda: request(path, argv), args.calls)
+                assert out == cout == rout, "client output differs from the CLI for %s" % a
+                print("%-12s %10.1f %10.1f %10.2f %8.1f" % (a, 1e3 * tcli, 1e3 * tclient, 1e3 * treq, tcli / tclient))
+        finally:
+            proc.terminate()
+            proc.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+
+# Symmetry reduced neighbor search against the full search
+#
+#   python benchmarks/bench_symmetry.py
+#   python benchmarks/bench_symmetry.py --sizes 2 4 6 --radius 0 3 5 --structure POSCAR
+#
+# The structure (BC8 silicon by default) is repeated n x n x n times, the
+# space group of every supercell is found once with spglib and both searches
+# are timed on it. That both give the same list is tested in
+# tests/test_symmetry_search.py.
+
+import argparse
+import os
+import time
+import numpy as np
+import spglib
+
+from vaspfileinspector import reader
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+
+
+def supercell(H, x, species, numbers, n):
+    xs = np.dot(x, np.linalg.inv(H))
+    shifts = np.array([(a, b, c) for a in range(n) for b in range(n) for c in range(n)])
+    xs = ((xs[:, None, :] + shifts[None, :, :]) / float(n)).reshape(-1, 3)
+    Hn = np.asarray(H) * n
+    return Hn, np.dot(xs, Hn), list(np.repeat(species, len(shifts))), np.repeat(numbers, len(shifts))
+
+
+def timed(nn, x, lattice, species, rcut, repeat):
+    best = float("inf")
+    for i in range(repeat):
+        t0 = time.perf_counter()
+        nn.find(x, lattice, species, rcut)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    cli = argparse.ArgumentParser(description="symmetry reduced neighbor search")
+    cli.add_argument("--structure", default=BC8, help="unit cell to repeat (default: BC8-mp.poscar)")
+    cli.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 6], help="supercell repeats n")
+    cli.add_argument("--radius", type=float, nargs="+", default=[0.0, 3.0, 5.0], help="search radii, 0 = automatic")
+    cli.add_argument("--symprec", type=float, default=0.05)
+    cli.add_argument("--repeat", type=int, default=3)
+    args = cli.parse_args()
+
+    data = reader.read_vasp(args.structure)
+    print("%8s %8s %8s %10s %10s %10s %10s %8s" %
+          ("natoms", "unique", "rcut", "pairs", "spglib (s)", "full (s)", "sym (s)", "speedup"))
+    for n in args.sizes:
+        H, x, species, numbers = supercell(data[0], data[1], data[2], data[4], n)
+        lattice = Lattice(H)
+        t0 = time.perf_counter()
+        dataset = spglib.get_symmetry_dataset((lattice.H, lattice.to_fractional(x), numbers), args.symprec)
+        tsym = time.perf_counter() - t0
+
+        for rcut in args.radius:
+            full = Neighbors(rcut)
+            tfull = timed(full, x, lattice, species, rcut, args.repeat)
+            reduced = Neighbors(rcut)
+            reduced.set_symmetry(dataset, args.symprec)
+            tred = timed(reduced, x, lattice, species, rcut, args.repeat)
+
+            print("%8i %8i %8.2f %10i %10.3f %10.4f %10.4f %8.2f" %
+                  (len(x), reduced.unique, full.rcut, len(full.bonds), tsym, tfull, tred, tfull / tred))
+
+
+if __name__ == "__main__":
+    main()
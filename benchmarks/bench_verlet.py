@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Verlet list updates along a trajectory against a fresh search per frame
+#
+#   python benchmarks/bench_verlet.py
+#   python benchmarks/bench_verlet.py --natoms 200 2000 --frames 60 --step 0.05
+#
+# Atoms of a random box take random steps and are wrapped back into the
+# cell every frame, so atoms near the faces cross the periodic boundary.
+# Neighbors.update() with a skin is timed against Neighbors.find() on every
+# frame. That both give the same list is tested in tests/test_verlet.py.
+
+import argparse
+import time
+import numpy as np
+
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+
+def trajectory(natoms, frames, step, seed=0):
+    rng = np.random.default_rng(seed)
+    a = (natoms / 0.05) ** (1.0 / 3.0)
+    H = np.eye(3) * a
+    xs = rng.random((natoms, 3))
+    for f in range(frames):
+        yield H, np.dot(xs, H)
+        xs = (xs + rng.normal(0.0, step / a, xs.shape)) % 1.0
+
+
+def main():
+    cli = argparse.ArgumentParser(description="Verlet list updates against a fresh search per frame")
+    cli.add_argument("--natoms", type=int, nargs="+", default=[200, 2000])
+    cli.add_argument("--frames", type=int, default=60)
+    cli.add_argument("--step", type=float, default=0.05, help="rms displacement per frame (Å)")
+    cli.add_argument("--rcut", type=float, default=3.0)
+    cli.add_argument("--skin", type=float, default=0.6)
+    args = cli.parse_args()
+
+    print("%8s %8s %10s %10s %10s %8s" % ("natoms", "frames", "rebuilds", "find (s)", "update (s)", "speedup"))
+    for natoms in args.natoms:
+        species = ["Si"] * natoms
+        nn = Neighbors(args.rcut, skin=args.skin)
+        tfind = tupdate = 0.0
+        for H, x in trajectory(natoms, args.frames, args.step):
+            lattice = Lattice(H)
+            t0 = time.perf_counter()
+            nn.update(x, lattice, species)
+            tupdate += time.perf_counter() - t0
+            fresh = Neighbors(args.rcut)
+            t0 = time.perf_counter()
+            fresh.find(x, lattice, species, args.rcut)
+            tfind += time.perf_counter() - t0
+        print("%8i %8i %10i %10.4f %10.4f %8.2f" % (natoms, args.frames, nn.rebuilds, tfind, tupdate, tfind / tupdate))
+
+
+if __name__ == "__main__":
+    main()
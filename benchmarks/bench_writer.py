@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+# Write throughput of writer.write_poscar against the old per atom writer
+#
+#   python benchmarks/bench_writer.py
+#   python benchmarks/bench_writer.py --natoms 1000000 --precision 10
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+
+from vaspfileinspector import reader, writer
+
+
+# reference: the writer as it was before the bulk coordinate formatting
+def write_lines(name, H, xs, species, counts):
+    out = open(name, 'w')
+    out.write("benchmark - primitive cell" + '\n')
+    out.write("1.00000" + '\n')
+    out.write("%5f %5f %5f" % (H[0][0], H[0][1], H[0][2]) + '\n')
+    out.write("%5f %5f %5f" % (H[1][0], H[1][1], H[1][2]) + '\n')
+    out.write("%5f %5f %5f" % (H[2][0], H[2][1], H[2][2]) + '\n')
+    for i in range(len(species)):
+        out.write("%s " % species[i])
+    out.write('\n')
+    for i in range(len(counts)):
+        out.write("%i " % counts[i])
+    out.write('\n')
+    out.write("Direct" + '\n')
+    for i in range(len(xs)):
+        out.write("%5f %5f %5f" % (xs[i][0], xs[i][1], xs[i][2]) + '\n')
+    out.close()
+
+
+def main():
+    cli = argparse.ArgumentParser(description="structure writer throughput")
+    cli.add_argument("--natoms", type=int, nargs="+", default=[10000, 100000, 1000000])
+    cli.add_argument("--precision", type=int, default=writer.PRECISION)
+    args = cli.parse_args()
+
+    print("%10s %10s %12s %12s %12s %8s" % ("natoms", "MB", "bulk (s)", "lines (s)", "atoms/s", "speedup"))
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        for natoms in args.natoms:
+            H = np.eye(3) * 2.7 * natoms ** (1.0 / 3.0)
+            xs = rng.random((natoms, 3))
+            symbols = ["Si"] * (natoms // 3) + ["O"] * (natoms - natoms // 3)
+            bulk = os.path.join(tmp, "bulk.vasp")
+            lines = os.path.join(tmp, "lines.vasp")
+
+            t0 = time.perf_counter()
+            writer.write_poscar(bulk, H, xs, symbols, "benchmark - primitive cell", precision=args.precision)
+            fast = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            write_lines(lines, H, xs, ["Si", "O"], [natoms // 3, natoms - natoms // 3])
+            slow = time.perf_counter() - t0
+
+            data = reader.read_vasp(bulk)
+            assert np.allclose(np.dot(data[1], np.linalg.inv(H)), xs, atol=10.0 ** -args.precision)
+
+            print("%10i %10.2f %12.4f %12.4f %12.3e %8.1f" %
+                  (natoms, os.path.getsize(bulk) / 1e6, fast, slow, natoms / fast, slow / fast))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,3 +5,6 @@ VFI: Utility to analyze POSCAR/CONTCAR structure file
 """
 
 __version__ = "0.3.0"
+
+# staged analysis API, see pipeline.py
+from vaspfileinspector.pipeline import (inspect, Inspection)
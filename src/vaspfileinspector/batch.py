@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+import argparse
+import fnmatch
+import glob
+import csv
+import json
+import time
+import multiprocessing as mp
+import textwrap
+
+from vaspfileinspector.pipeline import inspect
+
+# Batch mode, one summary row per structure file.
+# Files are expanded lazily from globs and directory trees and fanned out over
+# a process pool; every worker imports the package once and then handles
+# many files. Rows are written as soon as they arrive, a file that fails to
+# parse or analyze gets a row with the error instead of stopping the run.
+
+FIELDS = ["file","compound","natoms","density","spacegroup","number","bravais","min_bond","min_pair","nbonds","rcut","seconds","error"]
+
+# file names picked up when walking a directory
+PATTERNS = ["POSCAR*","CONTCAR*","XDATCAR*","*.vasp","*.poscar","*.contcar"]
+COMPRESSED = (".gz",".bz2",".xz")
+
+
+def get_arguments(argv):
+
+	cli = argparse.ArgumentParser(
+    prog="vfi-batch",
+    formatter_class=argparse.RawDescriptionHelpFormatter,
+    description=textwrap.dedent('''\
+           Summarize many POSCAR/CONTCAR files into one table
+           compound, density, space group, minimum bond and bond count
+         -----------------------------------------------------------------
+         '''),
+    epilog=textwrap.dedent('''\
+         examples:
+         -----------------------------------------------------------------
+            %(prog)s -j 32 -o screening.csv runs/
+            %(prog)s -o results.jsonl "runs/**/CONTCAR" -r 2.5 -t 1e-3
+         '''))
+
+	cli.add_argument("PATHS",help="files, directories (searched recursively) or glob patterns",nargs="+",type=str)
+	cli.add_argument("-j","--jobs=", dest="jobs",help="worker processes (default = number of cpus)",default=os.cpu_count(),type=int)
+	cli.add_argument("-o","--output=", dest="output",help="output table, .csv or .jsonl (default = stdout as csv)",default=None,type=str)
+	cli.add_argument("-f","--format=", dest="format",help="output format, csv or jsonl (default = from the output name)",choices=["csv","jsonl"],default=None)
+	cli.add_argument("-p","--pattern=", dest="patterns",help="file name pattern used inside directories, can be repeated (default = %s)" % " ".join(PATTERNS),action="append",default=None)
+	cli.add_argument("-r","--radius=", dest="rcut",help="search radius for considering an atom as nearest neighbor,(default = %(default)s Å, automatic)",default=0.0,type=float)
+	cli.add_argument("-t","--tolerance=", dest="symprec",help="precision in determining crystal symmetry in Cartesian coordinates,(default = %(default)s Å)",default=0.05,type=float)
+	args = cli.parse_args(argv)
+
+	if args.patterns is None:
+		args.patterns = PATTERNS
+	if args.format is None:
+		if args.output is not None and args.output.endswith((".jsonl",".json")):
+			args.format = "jsonl"
+		else:
+			args.format = "csv"
+
+	return args
+
+
+# expand the command line paths lazily, in order and without duplicates
+def iter_files(paths,patterns=PATTERNS):
+	seen = set()
+	for path in paths:
+		if os.path.isdir(path):
+			candidates = _walk(path,patterns)
+		elif os.path.exists(path):
+			candidates = [path]
+		else:
+			candidates = glob.iglob(path,recursive=True)
+		for name in candidates:
+			if os.path.isdir(name):
+				continue
+			if name not in seen:
+				seen.add(name)
+				yield name
+
+
+def _walk(top,patterns):
+	for root,dirs,files in os.walk(top):
+		dirs.sort()
+		for name in sorted(files):
+			# compressed copies match the pattern of the plain name
+			plain = os.path.splitext(name)[0] if name.endswith(COMPRESSED) else name
+			if any(fnmatch.fnmatch(plain,p) for p in patterns):
+				yield os.path.join(root,name)
+
+
+def analyze_file(args):
+	path,rcut,symprec = args
+
+	row = dict((k,None) for k in FIELDS)
+	row["file"] = path
+	t0 = time.perf_counter()
+	try:
+		with inspect(path,rcut=rcut,symprec=symprec,cache=False) as result:
+			atoms = result.atoms
+			result.symmetry
+			lattice = result.lattice
+			bonds = result.bonds
+
+		row["compound"] = atoms.get_compound()
+		row["natoms"] = atoms.get_number_of_atoms()
+		row["density"] = float(atoms.get_density())
+		row["spacegroup"] = lattice.symIntlSymb
+		row["number"] = int(lattice.spgNumber)
+		row["bravais"] = lattice.bravais
+		row["min_bond"] = bonds["min_bond"]
+		row["min_pair"] = bonds["min_pair"]
+		row["nbonds"] = bonds["nbonds"]
+		row["rcut"] = bonds["rcut"]
+	except Exception as e:
+		row["error"] = "%s: %s" % (type(e).__name__,e)
+	row["seconds"] = round(time.perf_counter() - t0,6)
+	return row
+
+
+class TableWriter:
+	def __init__(self,out,fmt):
+		self.out = out
+		self.fmt = fmt
+		if fmt == "csv":
+			self.writer = csv.DictWriter(out,fieldnames=FIELDS)
+			self.writer.writeheader()
+
+	def write(self,row):
+		if self.fmt == "csv":
+			self.writer.writerow(row)
+		else:
+			self.out.write(json.dumps(row) + '\n')
+		self.out.flush()
+
+
+def run(files,out,fmt="csv",jobs=1,rcut=0.0,symprec=0.05):
+
+	table = TableWriter(out,fmt)
+	tasks = ((path,rcut,symprec) for path in files)
+
+	done = 0
+	failed = 0
+	if jobs is None or jobs <= 1:
+		results = map(analyze_file,tasks)
+		for row in results:
+			table.write(row)
+			done += 1
+			failed += row["error"] is not None
+		return done,failed
+
+	with mp.Pool(jobs) as pool:
+		for row in pool.imap_unordered(analyze_file,tasks,chunksize=8):
+			table.write(row)
+			done += 1
+			failed += row["error"] is not None
+	return done,failed
+
+
+def main():
+
+	args = get_arguments(sys.argv[1:])
+
+	if args.output is None:
+		out = sys.stdout
+	else:
+		out = open(args.output,'w',newline='')
+	try:
+		t0 = time.perf_counter()
+		done,failed = run(iter_files(args.PATHS,args.patterns),out,args.format,args.jobs,args.rcut,args.symprec)
+		sys.stderr.write("vfi-batch: %i files, %i failed, %.1f s\n" % (done,failed,time.perf_counter()-t0))
+	finally:
+		if args.output is not None:
+			out.close()
+
+
+if __name__ == "__main__": main()
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+import os
+import hashlib
+import tempfile
+import numpy as np
+from collections import OrderedDict
+
+# On disk cache of parsed structures and analysis results.
+#
+# Entries are plain .npz files named by a sha256 key made of the content hash
+# of the input file, the stage (structure, symmetry, neighbors) and the
+# parameters the stage depends on, so an edited file or a different rcut or
+# symprec simply misses. Each stage is cached on its own, a new rcut reuses
+# the parsed structure and the symmetry dataset.
+#
+# A hit touches the entry, after every write the oldest entries are removed
+# until the directory fits in the size limit (least recently used first).
+#
+#   VFI_CACHE_DIR    cache directory (default ~/.cache/vfi)
+#   VFI_CACHE_SIZE   size limit in MB (default 256)
+
+# bump when the layout of an entry changes, old entries then never hit
+VERSION = 1
+
+CACHE_SIZE = 256
+
+# MB of entries MemoryCache keeps in memory
+MEMORY_SIZE = 512
+
+
+def cache_dir():
+	path = os.environ.get("VFI_CACHE_DIR")
+	if path:
+		return path
+	base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"),".cache")
+	return os.path.join(base,"vfi")
+
+
+def file_hash(filename,chunk=1<<20):
+	h = hashlib.sha256()
+	with open(filename,'rb') as f:
+		block = f.read(chunk)
+		while block:
+			h.update(block)
+			block = f.read(chunk)
+	return h.hexdigest()
+
+
+class Cache:
+	def __init__(self,path=None,maxsize=None,enabled=True):
+
+		self.path = path if path is not None else cache_dir()
+		if maxsize is None:
+			maxsize = float(os.environ.get("VFI_CACHE_SIZE",CACHE_SIZE))*1024*1024
+		self.maxsize = maxsize
+		self.enabled = enabled
+
+		self.hits = 0
+		self.misses = 0
+
+		# content hash per file name, the file is read once per run
+		self._digests = {}
+
+	def key(self,*parts):
+		text = "\0".join(str(p) for p in (VERSION,) + parts)
+		return hashlib.sha256(text.encode()).hexdigest()
+
+	def digest(self,filename):
+		if not filename in self._digests:
+			self._digests[filename] = file_hash(filename)
+		return self._digests[filename]
+
+	def entry(self,key):
+		return os.path.join(self.path,key + ".npz")
+
+	def load(self,key):
+		if not self.enabled:
+			return None
+		name = self.entry(key)
+		try:
+			with np.load(name,allow_pickle=False) as z:
+				arrays = dict((k,z[k]) for k in z.files)
+		except FileNotFoundError:
+			return None
+		except (OSError,ValueError,EOFError):
+			# truncated or foreign file, drop it
+			self._remove(name)
+			return None
+		# a read only or shared cache still hits, the entry just ages
+		try:
+			os.utime(name)
+		except OSError:
+			pass
+		return arrays
+
+	def save(self,key,arrays):
+		if not self.enabled or arrays is None:
+			return
+		tmp = None
+		try:
+			os.makedirs(self.path,exist_ok=True)
+			# write next to the entry and rename, readers never see half a file
+			fd,tmp = tempfile.mkstemp(dir=self.path,suffix=".tmp")
+			with os.fdopen(fd,'wb') as f:
+				np.savez(f,**arrays)
+			os.replace(tmp,self.entry(key))
+			tmp = None
+		except OSError:
+			# a read only or full disk only costs the speed up
+			return
+		finally:
+			if tmp is not None:
+				self._remove(tmp)
+		self.evict()
+
+	# the cached value of a stage or compute(), stored for the next run
+	def cached(self,key,compute,pack,unpack):
+		arrays = self.load(key)
+		if arrays is not None:
+			try:
+				value = unpack(arrays)
+				self.hits += 1
+				return value
+			except (KeyError,ValueError,TypeError):
+				self._remove(self.entry(key))
+		self.misses += 1
+		value = compute()
+		if self.enabled:
+			self.save(key,pack(value))
+		return value
+
+	# (lattice, positions, species, num_atoms, numbers) of reader.read_vasp
+	def structure(self,filename,frame,read):
+		if not self.enabled:
+			return read()
+		key = self.key(self.digest(filename),"structure",frame)
+		return self.cached(key,read,pack_structure,unpack_structure)
+
+	# spglib symmetry dataset of the structure
+	def symmetry(self,filename,frame,symprec,analyze):
+		if not self.enabled:
+			return analyze()
+		return self.cached(self.symmetry_key(filename,frame,symprec),analyze,pack_dataset,unpack_dataset)
+
+	def symmetry_key(self,filename,frame,symprec):
+		return self.key(self.digest(filename),"symmetry",frame,repr(float(symprec)),_spglib_version())
+
+	# neighbor list of nn, find() runs the search on a miss
+	def neighbors(self,filename,frame,nn,find):
+		if not self.enabled:
+			find()
+			return nn
+		rcut = 0.0 if nn.search else float(nn.rcut)
+		key = self.key(self.digest(filename),"neighbors",frame,repr(rcut),np.dtype(nn.dtype).str)
+		def compute():
+			find()
+			return nn
+		return self.cached(key,compute,pack_neighbors,lambda arrays: unpack_neighbors(nn,arrays))
+
+	def entries(self,suffix=".npz"):
+		found = []
+		try:
+			with os.scandir(self.path) as it:
+				for e in it:
+					if e.name.endswith(suffix) and e.is_file():
+						st = e.stat()
+						found.append((st.st_mtime,st.st_size,e.path))
+		except FileNotFoundError:
+			pass
+		return found
+
+	def size(self):
+		return sum(size for mtime,size,name in self.entries())
+
+	# drop least recently used entries until the cache fits maxsize
+	def evict(self):
+		found = sorted(self.entries())
+		total = sum(size for mtime,size,name in found)
+		for mtime,size,name in found:
+			if total <= self.maxsize:
+				break
+			self._remove(name)
+			total -= size
+
+	def clear(self):
+		n = 0
+		for mtime,size,name in self.entries():
+			self._remove(name)
+			n += 1
+		# left behind by writes that failed half way
+		for mtime,size,name in self.entries(".tmp"):
+			self._remove(name)
+		return n
+
+	def _remove(self,name):
+		try:
+			os.remove(name)
+		except OSError:
+			pass
+
+
+# In memory LRU of entries in front of the disk cache, kept by vfi serve.
+# A hit hands out copies, the arrays in memory are never changed by a run.
+# Files are hashed again only when their size or modification time changed.
+class MemoryCache(Cache):
+	def __init__(self,path=None,maxsize=None,memory=MEMORY_SIZE*1024*1024,disk=True):
+
+		Cache.__init__(self,path,maxsize,enabled=True)
+		self.memory = memory
+		self.disk = disk
+
+		# key -> arrays, least recently used first
+		self._entries = OrderedDict()
+		self._nbytes = 0
+
+		# file name -> (size, mtime, inode, digest)
+		self._stats = {}
+
+	def digest(self,filename):
+		name = os.path.abspath(filename)
+		st = os.stat(name)
+		stamp = (st.st_size,st.st_mtime_ns,st.st_ino)
+		known = self._stats.get(name)
+		if known is None or known[:3] != stamp:
+			known = stamp + (file_hash(name),)
+			self._stats[name] = known
+		return known[3]
+
+	def load(self,key):
+		arrays = self._entries.get(key)
+		if arrays is None:
+			arrays = Cache.load(self,key) if self.disk else None
+			if arrays is None:
+				return None
+			self._keep(key,arrays)
+		else:
+			self._entries.move_to_end(key)
+		return dict((k,v.copy()) for k,v in arrays.items())
+
+	def save(self,key,arrays):
+		if arrays is None:
+			return
+		arrays = dict((k,np.array(v)) for k,v in arrays.items())
+		self._keep(key,arrays)
+		if self.disk:
+			Cache.save(self,key,arrays)
+
+	def _keep(self,key,arrays):
+		self._drop(key)
+		nbytes = sum(v.nbytes for v in arrays.values())
+		if nbytes > self.memory:
+			return
+		self._entries[key] = arrays
+		self._nbytes += nbytes
+		while self._nbytes > self.memory:
+			self._drop(next(iter(self._entries)))
+
+	def _drop(self,key):
+		arrays = self._entries.pop(key,None)
+		if arrays is not None:
+			self._nbytes -= sum(v.nbytes for v in arrays.values())
+
+	def __len__(self):
+		return len(self._entries)
+
+	def clear(self):
+		self._entries.clear()
+		self._nbytes = 0
+		self._stats.clear()
+		return Cache.clear(self)
+
+
+def _spglib_version():
+	import spglib
+	return getattr(spglib,"__version__","")
+
+
+def pack_structure(data):
+	lattice,positions,species,num_atoms,numbers = data
+	return {"lattice":np.asarray(lattice,dtype='double'),
+	        "positions":np.asarray(positions,dtype='double'),
+	        "species":np.asarray(species,dtype=str),
+	        "num_atoms":np.asarray(num_atoms),
+	        "numbers":np.asarray(numbers)}
+
+def unpack_structure(arrays):
+	return (arrays["lattice"],arrays["positions"],[str(s) for s in arrays["species"]],
+	        arrays["num_atoms"],arrays["numbers"])
+
+
+# every field of the dataset that has a value, strings and lists of strings
+# become unicode arrays
+def pack_dataset(dataset):
+	if dataset is None:
+		return None
+	if isinstance(dataset,dict):
+		fields = dataset
+	else:
+		fields = dict((k,getattr(dataset,k)) for k in dataset.__dataclass_fields__)
+	return dict((k,np.asarray(v)) for k,v in fields.items() if v is not None)
+
+def unpack_dataset(arrays):
+	import spglib
+	fields = {}
+	for k,v in arrays.items():
+		if v.ndim == 0:
+			v = v.item()
+		elif v.dtype.kind == 'U':
+			v = [str(s) for s in v]
+		fields[k] = v
+	Dataset = getattr(spglib,"SpglibDataset",None)
+	if Dataset is not None:
+		return Dataset(**dict((k,fields.get(k)) for k in Dataset.__dataclass_fields__))
+	return fields
+
+
+def pack_neighbors(nn):
+	return {"indicies":nn.indicies,
+	        "neighbors":nn.neighbors,
+	        "bonds":nn.bonds,
+	        "images":nn.images,
+	        "rcut":np.asarray(nn.rcut,dtype='double'),
+	        "nbonds":np.asarray(nn.nbonds),
+	        "minPair":np.asarray("" if nn.minPair is None else nn.minPair),
+	        "minBond":np.asarray(nn.minBond,dtype='double'),
+	        "passes":np.asarray(getattr(nn,"passes",0))}
+
+def unpack_neighbors(nn,arrays):
+	nn.indicies = arrays["indicies"]
+	nn.neighbors = arrays["neighbors"]
+	nn.bonds = arrays["bonds"]
+	nn.images = arrays["images"]
+	nn.rcut = float(arrays["rcut"])
+	nn.nbonds = int(arrays["nbonds"])
+	nn.minPair = str(arrays["minPair"]) or None
+	nn.minBond = float(arrays["minBond"])
+	nn.passes = int(arrays["passes"])
+	nn.cached = True
+	return nn
@@ -1,27 +1,20 @@
 # -*- coding: utf-8 -*-
 
 import sys
-import argparse
-import numpy as np
-import textwrap
-
-# import reader
-# import common
-# from neighbors import *
-# from lattice import *
-# from atoms import *
-from vaspfileinspector import common, reader
-from vaspfileinspector.neighbors import *
-from vaspfileinspector.lattice import *
-from vaspfileinspector.atoms import *
-
-import spglib
+
+# Nothing is loaded up front, the argument parser is imported when the
+# arguments are parsed, numpy, spglib and the analysis modules in main() when
+# a selected option needs them, so --help, --version and the light options
+# start quickly in shell loops and --client only pays for the socket
 
 ## Author: Joe Gonzalez, Department of Physics, University of South Florida
 ## Version 3: 08/2017
 
 def get_arguments(argv):
 
+	import argparse
+	import textwrap
+
 	cli = argparse.ArgumentParser(
     formatter_class=argparse.RawDescriptionHelpFormatter,
     description=textwrap.dedent('''\
@@ -35,7 +28,8 @@ def get_arguments(argv):
          -----------------------------------------------------------------
             %(prog)s POSCAR > structure-data.nfo
             %(prog)s -p POSCAR
-            %(prog)s -f POSCAR -bc > bonding-data.nfo 
+            %(prog)s POSCAR -bc > bonding-data.nfo
+            %(prog)s -f 0 XDATCAR -bc
             %(prog)s --debug --radius=2 --neighbors --save sns2.vasp --primitive
             %(prog)s -vvvvvnacrs 3 --tolerance=1e-3 mos2.contcar 
             %(prog)s -vvnacrs 3 mos2.contcar -t 0.01
@@ -45,25 +39,52 @@ def get_arguments(argv):
 	cli.add_argument("FILE",help="input file containig data to process",type=str)
 	cli.add_argument("-a","--atoms",dest="printAtoms",help="print atomic scale info. ntotal, types ...",action="store_true")
 	cli.add_argument("-b","--bonds",dest="printBonds",help="print bonding info. total, species connectivity",action="store_true")
+	cli.add_argument("--client", dest="client",help="hand the run to a warm vfi serve daemon, same output, runs here when none is listening",action="store_true")
 	cli.add_argument("-c","--cell",dest="printCell",help="print info on the unit cell; a,b,c volume ... ",action="store_true")
-	cli.add_argument("-n","--neighbors",dest="printNlist",help="print bonding info and nearest neighbor information. n^2 recursive search for nearest neighbors stop when at least (1) bond is made, use this for assigning all neighbors.",action="store_true")
+	cli.add_argument("-e","--export=", dest="export",help="write the structure and the computed neighbor list, bonds, g(r) and topology to a binary .npz or .h5 (needs h5py) file",default=None,type=str)
+	cli.add_argument("-f","--frame=", dest="frame",help="frame of an XDATCAR trajectory to analyze, negative counts from the end (default = %(default)s)",default=-1,type=int)
+	cli.add_argument("-g","--rdf",dest="printRdf",help="print the radial distribution function, total g(r) and partials g_ab(r). Averaged over all frames of an XDATCAR",action="store_true")
+	cli.add_argument("-j","--jobs=", dest="jobs",help="worker processes for the neighbor search, small cells always run serial (default = %(default)s)",default=1,type=int)
+	cli.add_argument("-n","--neighbors",dest="printNlist",help="print bonding info and the neighbors of every atom. Without -r the cutoff is the first gap (or first minimum) in the distance spectrum of a probe search, which holds the first shell.",action="store_true")
+	cli.add_argument("-o","--topology",dest="printTopology",help="print coordination number histograms and bond angle distributions per species",action="store_true")
 	cli.add_argument("-p","--primitive", dest="getPrimitive",help="if possible,reduce convetional cell to primitive unit cell",action="store_true")
+	cli.add_argument("--profile", dest="profile",help="report the time and peak memory of every stage of the run on stderr",action="store_true",default=False)
+	cli.add_argument("--profile-format=", dest="profileFormat",help="format of the --profile report,(default = %(default)s)",choices=["table","json"],default="table")
+	cli.add_argument("--precision=", dest="precision",help="decimals of the lattice and coordinates in written structure files,(default = %(default)s)",default=6,type=int)
 	cli.add_argument("-r","--radius=", dest="rcut",help="search radius for considering an atom as nearest neighbor,(default = %(default)s Å)",default=0.0,type=float)
+	cli.add_argument("--rmax=", dest="rmax",help="largest distance in the radial distribution function,(default = %(default)s Å)",default=6.0,type=float)
+	cli.add_argument("--rbins=", dest="rbins",help="number of bins in the radial distribution function,(default = %(default)s)",default=120,type=int)
 	cli.add_argument("-s","--save",dest="save",help="save the computed data to a file <stoich>.[bonds,atoms,cell]. ex: P1S2H2 -> P1S2H2.bonds P1S2H2.atoms, default == do not save, print to stdout",action="store_true")
+	cli.add_argument("--socket=", dest="socket",help="Unix socket of the vfi serve daemon for --client (default = $VFI_SOCKET, else $XDG_RUNTIME_DIR/vfi.sock)",default=None,type=str)
+	cli.add_argument("--sweep", dest="sweep",help="report the space group found at each of the sweep tolerances",action="store_true",default=False)
+	cli.add_argument("--tolerances=", dest="tolerances",help="symmetry tolerances of --sweep, comma separated (default = 1e-5,1e-4,1e-3,1e-2,0.05,0.1,0.2)",default="1e-5,1e-4,1e-3,1e-2,0.05,0.1,0.2",type=str)
 	cli.add_argument("-t","--tolerance=", dest="symprec",help="precision in determining crystal symmetry in Cartesian coordinates,(default = %(default)s Å)",default=0.05,type=float)
+	cli.add_argument("-y","--symmetric", dest="useSymmetry",help="search the neighbors of the symmetry unique atoms only and map them onto the other atoms with the space group operations found with --tolerance",action="store_true",default=False)
 	cli.add_argument("-v", dest="verb",help="increase output verbosity",default=0,action="count")
+	cli.add_argument("--no-cache", dest="cache",help="do not read or write the cache of parsed structures, symmetry and neighbor lists",action="store_false")
+	cli.add_argument("--clear-cache", dest="clearCache",help="empty the cache directory before running",action="store_true")
 	cli.add_argument("--debug", dest="verb",help="extensive info, equivalent to \"-vvvv\"",action="store_true")
 	cli.add_argument('--version', action='version', version='%(prog)s 0.3.0.')
-	args = cli.parse_args()
+	args = cli.parse_args(argv)
 	# if args.verb>0: print "verbosity level: ", args.verb
 	# if args.verb>1: print "verbosity level: ", args.verb
 
 	return args
 
 
-def main():
+def main(argv=None,cache=None):
+
+	if argv is None:
+		argv = sys.argv[1:]
+
+	# warm daemon and its thin client, see server.py
+	if argv[:1] == ["serve"]:
+		from vaspfileinspector import server
+		return server.main(argv[1:])
+	if "--client" in argv:
+		from vaspfileinspector import server
+		return server.client(argv)
 
-	argv = sys.argv[1:]
 	parameters = get_arguments( argv )
 
 	if len(argv) == 1:
@@ -72,62 +93,105 @@ def main():
 		parameters.printAtoms = True
 		parameters.printCell = True
 
-	# data[0] -> lattice
-	# data[1] -> positions  in angstrom
-	# data[2] -> species
-	# data[3] -> ntypes
-	# data[4] -> (a)tomic (n)umber(s)
-	data = reader.read_vasp( parameters.FILE )
-
-	# create instance of Neighbors
-	nn = Neighbors(parameters.rcut)
-
-	# store data read from structure file
-	lattice = Lattice(data[0])
-	positions = data[1]
-	species = data[2]
-	ntypes = data[3]
-	ans = data[4]
-
-	# read in the data and store in the "atom" object
-	atoms = Atoms(lattice.H,lattice.volume,species,positions,ans,ntypes,fractional=False)
-	parameters.compound = atoms.get_compound()
-
-	# combine structural data, used for spacegroup/symmetry info
-	cell = (lattice.H,atoms.xs,ans)
-
-	# determine the symmetry, spacegroup, bravais, etc. 
-	# of the lattice
-	lattice.analyze_symmetry(cell,parameters.symprec)
-
-	# if we want bond level info, build the neighbor list first
-	if parameters.printBonds or parameters.printNlist:
-		nn.find(atoms.x,lattice,species,parameters.rcut)
+	from vaspfileinspector.pipeline import inspect
+	from vaspfileinspector.cache import Cache
+	from vaspfileinspector.profiling import Profiler
+
+	# stage times and memory, stages are no-ops unless --profile
+	profiler = Profiler(enabled=parameters.profile)
+
+	# parsed structures, symmetry datasets and neighbor lists of earlier runs,
+	# vfi serve passes its in memory cache
+	if cache is None or not parameters.cache:
+		cache = Cache(enabled=parameters.cache)
+	if parameters.clearCache:
+		if cache.enabled:
+			cache.clear()
+		else:
+			Cache().clear()
+
+	tolerances = None
+	if parameters.sweep:
+		from vaspfileinspector.symmetry import parse_tolerances
+		tolerances = parse_tolerances(parameters.tolerances)
+
+	# every section is computed when it is first used below
+	result = inspect( parameters.FILE,frame=parameters.frame,rcut=parameters.rcut,symprec=parameters.symprec,
+	                  jobs=parameters.jobs,symmetric=parameters.useSymmetry,rmax=parameters.rmax,
+	                  rbins=parameters.rbins,tolerances=tolerances,cache=cache,
+	                  profiler=profiler if parameters.profile else None )
+
+	atoms = result.atoms
+	parameters.compound = result.composition["compound"]
 
 	# print the atomic level information
 	if parameters.printAtoms:
-		atoms.show_info(parameters)
+		with profiler.stage("write atoms"):
+			atoms.show_info(parameters)
 
 	# print unit cell info, vectors, angles, symmetry ...
 	if parameters.printCell:
-		lattice.show_info(parameters,cell,parameters.symprec)
+		# the symmetry section sets the space group on the lattice
+		result.symmetry
+		with profiler.stage("write cell"):
+			result.lattice.show_info(parameters,result.cell,parameters.symprec)
+
+	# space group over a range of tolerances
+	if parameters.sweep:
+		sweep = result.sweep
+		with profiler.stage("write sweep"):
+			sweep.show_info(parameters)
 
 	# print bonds and optionally neighbor info
+	nn = None
+	if parameters.printBonds or parameters.printNlist or parameters.printTopology:
+		nn = result.neighbors
 	if parameters.printBonds and parameters.printNlist:
-		nn.show_info( parameters,atoms,2 )
+		with profiler.stage("write bonds"):
+			nn.show_info( parameters,atoms,2 )
 	elif parameters.printBonds:
-		nn.show_info( parameters,atoms )
+		with profiler.stage("write bonds"):
+			nn.show_info( parameters,atoms )
+
+	# coordination numbers and bond angles
+	topo = None
+	if parameters.printTopology:
+		topo = result.topology
+		with profiler.stage("write topology"):
+			topo.show_info(parameters)
+
+	# radial distribution function
+	rdf = None
+	if parameters.printRdf:
+		rdf = result.rdf
+		with profiler.stage("write rdf"):
+			rdf.show_info(parameters)
+
+	# binary export of everything computed above
+	if parameters.export:
+		from vaspfileinspector import writer
+		with profiler.stage("export"):
+			writer.export( parameters.export,atoms,nn,rdf,topo )
 
 	# attempt to reduce convetional cell to primitive cell
 	if parameters.getPrimitive:
-		primitive = spglib.find_primitive( cell,parameters.symprec )		
+		from vaspfileinspector import reader
+		from vaspfileinspector.atoms import Atoms
+		primitive = result.primitive
 		patoms = Atoms(lattice=primitive[0],positions=primitive[1],numbers=primitive[2],fractional=True)
 		try:
 			test = primitive[0][0][0] * 0
 		except TypeError:
 			print("Warning: could not reduce to primitive cell...")
 
-		reader.write_vasp( primitive[0],patoms,parameters )
+		with profiler.stage("write primitive"):
+			reader.write_vasp( primitive[0],patoms,parameters )
+
+	result.close()
+
+	if parameters.profile:
+		profiler.add_neighbors(nn)
+		profiler.show_info(parameters,parameters.profileFormat)
 
 
 if __name__ == "__main__": main()
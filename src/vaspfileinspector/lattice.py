@@ -1,7 +1,6 @@
 # -*- coding: utf-8 -*-
 import numpy as np
-from math import (sin,cos,sqrt)
-import spglib
+from math import sqrt
 import sys
 from vaspfileinspector.common import (R2D,D2R)
 
@@ -21,43 +20,26 @@ class Lattice:
 		self.symIntlSymb = "P1"
 		self.spgNumber = 1
 		self.bravais = "unknown"
-
-		self.H = H
+		self.dataset = None
 
 		self.alat = 1.0
-		self.a1 = [float(x) for x in H[0]]
-		self.a2 = [float(x) for x in H[1]]
-		self.a3 = [float(x) for x in H[2]]
-
-		self.box2cell()
-		self.set_volume()
+		self.set_cell(H)
 
 		## finish construction
 
-	def analyze_symmetry(self,cell,sp):
+	# dataset can be passed in when it is already known, e.g. from the cache
+	def analyze_symmetry(self,cell,sp,dataset=None):
 
-		dataset = spglib.get_symmetry_dataset(cell,sp)
+		if dataset is None:
+			import spglib
+			dataset = spglib.get_symmetry_dataset(cell,sp)
+		self.dataset = dataset
 
-		self.spgNumber = dataset['number']
+		self.spgNumber = dataset_field(dataset,'number')
 
-		self.symIntlSymb = dataset['international']
+		self.symIntlSymb = dataset_field(dataset,'international')
 
-		if self.spgNumber <= 2:
-			self.bravais = "triclinic"
-		elif self.spgNumber <= 15:
-			self.bravais = "monoclinic"
-		elif self.spgNumber <= 74:
-			self.bravais = "orthorhombic"
-		elif self.spgNumber <= 142:
-			self.bravais = "tetragonal"
-		elif self.spgNumber <= 167:
-			self.bravais = "trigonal"
-		elif self.spgNumber <= 194:
-			self.bravais = "hexagonal"
-		elif self.spgNumber <= 230:
-			self.bravais = "cubic"
-		else:
-			self.bravais = "unknown"            
+		self.bravais = bravais_lattice(self.spgNumber)
 
 	def show_info(self,parameters,cell,sp):
 
@@ -95,29 +77,40 @@ class Lattice:
 				out.close()
 
 
+	# everything derived from the cell matrix is computed here once,
+	# conversions and the neighbor search use these arrays
+	def set_cell(self,H):
+
+		self.H = np.array(H,dtype='double').reshape(3,3)
+		self.a1 = [float(x) for x in self.H[0]]
+		self.a2 = [float(x) for x in self.H[1]]
+		self.a3 = [float(x) for x in self.H[2]]
+
+		# x_frac = x_cart . inverse
+		self.inverse = np.linalg.inv(self.H)
+		# g_ij = a_i . a_j
+		self.metric = np.dot(self.H,self.H.T)
+		# rows b_i with a_i . b_j = delta_ij, without the factor 2 pi
+		self.reciprocal = self.inverse.T.copy()
+		self.volume = abs(np.linalg.det(self.H))
+		# distance between opposite faces of the cell, 1/|b_i|
+		self.heights = 1.0/np.linalg.norm(self.reciprocal,axis=1)
+
+		self.box2cell()
+
 	def scale(self,a):
 		self.alat = a
-		self.a1 = [a*x for x in self.a1]
-		self.a2 = [a*x for x in self.a2]
-		self.a3 = [a*x for x in self.a3]
+		self.set_cell(self.H*a)
 
+	def to_fractional(self,x):
+		return np.dot(x,self.inverse)
 
 	def get_volume(self):
-		if self.volume is None:
-			self.set_volume()
-		else:
-			return self.volume
+		return self.volume
 
+	# the volume is cached by set_cell, kept for older callers
 	def set_volume(self):
-		ca = cos(self.alpha);sa = sin(self.alpha)
-		cb = cos(self.beta); sb = sin(self.beta)
-		cg = cos(self.gamma);sg = sin(self.gamma)
-
-		a = self.a
-		b = self.b
-		c = self.c
-
-		self.volume = a*b*c * sqrt(1.0- (ca*ca) - (cb*cb) - (cg*cg) + 2*(ca * cb * cg))
+		return self.volume
 
 	# Convert lower triangular matrix "H",
 	#      |  H[0][0]     0        0      |
@@ -126,9 +119,9 @@ class Lattice:
 	#     into conventional lattice vectors defined by 
 	#     "a" "b" "c" "alpha" "beta" "gamma"
 	def box2cell(self):
-		self.a = np.linalg.norm( self.H[0] )
-		self.b = np.linalg.norm( self.H[1] )
-		self.c = np.linalg.norm( self.H[2] )
+		self.a = sqrt(self.metric[0][0])
+		self.b = sqrt(self.metric[1][1])
+		self.c = sqrt(self.metric[2][2])
 
 		self.alpha = self._get_angle( self.H[1],self.H[2])
 		self.beta = self._get_angle( self.H[0],self.H[2])
@@ -139,3 +132,29 @@ class Lattice:
 		c = np.dot(u,v)/np.linalg.norm(u)/np.linalg.norm(v) # -> cosine of the angle
 		angle = np.arccos(np.clip(c, -1, 1)) # if you really want the angle
 		return angle
+
+
+# spglib >= 2.1 returns a dataclass whose dict interface is deprecated,
+# older versions (and datasets loaded as dicts) only have keys
+def dataset_field(dataset,name):
+	if isinstance(dataset,dict):
+		return dataset[name]
+	return getattr(dataset,name)
+
+def bravais_lattice(number):
+	if number <= 2:
+		return "triclinic"
+	elif number <= 15:
+		return "monoclinic"
+	elif number <= 74:
+		return "orthorhombic"
+	elif number <= 142:
+		return "tetragonal"
+	elif number <= 167:
+		return "trigonal"
+	elif number <= 194:
+		return "hexagonal"
+	elif number <= 230:
+		return "cubic"
+	else:
+		return "unknown"
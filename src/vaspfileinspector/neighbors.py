@@ -1,17 +1,23 @@
 # -*- coding: utf-8 -*-
 
 import numpy as np
-import math
+import itertools
+import time
 from vaspfileinspector.common import Point
 import sys
 
 
 class Neighbors:
-	def __init__(self,rcut=0):
-
-		self.indicies = []
-		self.neighbors = []
-		self.bonds = []
+	def __init__(self,rcut=0,engine="auto",dtype='double',jobs=1,skin=0.0):
+
+		# neighbor list in CSR form, neighbors of atom i are
+		# neighbors[indicies[i]:indicies[i+1]], with the bond lengths and
+		# the lattice image of each neighbor in the same slots
+		self.indicies = np.zeros(1,dtype=np.int32)
+		self.neighbors = np.zeros(0,dtype=np.int32)
+		self.bonds = np.zeros(0,dtype=dtype)
+		self.images = np.zeros((0,3),dtype=np.int8)
+		self.dtype = dtype
 		
 		if rcut == 0:
 			self.search = True
@@ -26,6 +32,31 @@ class Neighbors:
 
 		self.minBond = 10
 
+		# "direct" all pairs minimum image, "cells" linked cell or "auto"
+		self.engine = engine
+
+		# worker processes for the search, timings of the last parallel run
+		# and the parallel.ParallelSearch shared by the probe passes
+		self.jobs = jobs
+		self.parallel = None
+		self.workers = None
+
+		# the list was read from the cache, not searched, and the wall time
+		# (s) of the last find()
+		self.cached = False
+		self.seconds = 0.0
+
+		# Verlet list for trajectories, see update()
+		self.skin = skin
+		self.verlet = None
+		self.frames = 0
+		self.rebuilds = 0
+
+		# space group operations for the symmetry reduced search, see
+		# set_symmetry(), and the number of atoms searched by the last one
+		self.symmetry = None
+		self.unique = None
+
 
 	def show_info( self,parameters,atoms,depth=1 ):
 
@@ -59,8 +90,7 @@ class Neighbors:
 					nneighs = indexer[i+1] - indexer[i]
 					out.write(" %s%i atom(#%i) has %i neighbors:" % (atoms.symbols[i],atoms.ids[i],i+1,nneighs) + '\n')
 					for pj in range(indexer[i],indexer[i+1]):
-						if i != pj:
-							out.write("   %s%i-%s%i = %5f" % (atoms.symbols[i],atoms.ids[i],atoms.symbols[neighborList[pj]],atoms.ids[neighborList[pj]],bondList[pj]) + '\n')
+						out.write("   %s%i-%s%i = %5f" % (atoms.symbols[i],atoms.ids[i],atoms.symbols[neighborList[pj]],atoms.ids[neighborList[pj]],bondList[pj]) + '\n')
 		finally:
 			if parameters.save:
 				out.close()
@@ -81,19 +111,39 @@ class Neighbors:
 	def get_nn_list(self):
 		return self.indicies,self.neighbors
 
+	def get_image_list(self):
+		return self.images
+
+	# works for a single pair of points or for arrays of points (...,3)
 	def distance( self,atomi,atomj ):
-		d = math.sqrt(math.pow(atomi[0]-atomj[0],2) + math.pow(atomi[1]-atomj[1],2) + math.pow(atomi[2]-atomj[2],2))
-		return d
+		dr = np.asarray(atomi,dtype='double') - np.asarray(atomj,dtype='double')
+		return np.sqrt(np.sum(dr*dr,axis=-1))
 
+	# with rcut = 0 the cutoff is taken from the first gap in the distance
+	# spectrum of a single probe search, otherwise a fixed radius search
 	def find(self,atoms,lattice,species,rcut):
-		found = self.build_list( atoms,lattice,species,rcut )
+		t0 = time.perf_counter()
 		if self.search:
-			while not found:
-				found = self.build_list( atoms,lattice,species,rcut )
-				if not found:
-					rcut += 0.2
-				else:
-					break
+			found = self.search_list( atoms,lattice,species )
+		else:
+			found = self.build_list( atoms,lattice,species,rcut )
+		self.seconds = time.perf_counter() - t0
+		return found
+
+	# Search only the symmetry unique atoms, the neighbors of the other
+	# atoms are mapped from theirs with the operations of an spglib dataset
+	# found with tolerance symprec. Falls back to the full search whenever
+	# the operations do not map the structure onto itself within symprec
+	def set_symmetry(self,dataset,symprec):
+		if dataset is None:
+			self.symmetry = None
+			return
+		from vaspfileinspector.lattice import dataset_field
+		self.symmetry = {
+			"rotations":np.asarray(dataset_field(dataset,'rotations'),dtype=np.intp),
+			"translations":np.asarray(dataset_field(dataset,'translations'),dtype='double'),
+			"equivalent":np.asarray(dataset_field(dataset,'equivalent_atoms'),dtype=np.intp),
+			"symprec":float(symprec)}
 
 	def species_index( self,species,j ):
 
@@ -112,58 +162,789 @@ class Neighbors:
 		# atoms[id][x,y,z]
 		# lattice[ai][x,y,z]
 
-		idx = [-1,0,1]
-		found = False
+		x = np.asarray(atoms,dtype='double')
+		cell = _as_cell( lattice )
 
-		self.rcut = rcut
+		self.passes = 1
+		pi,pj,img,bij = self.collect_pairs( x,cell,rcut )
+		return self.store_list( len(x),species,rcut,pi,pj,img,bij )
 
-		nsize = 200*len(atoms)
-
-		for i in range(len(atoms)+1):
-			self.indicies.append(0)
-		for i in range(10*len(atoms)):
-			self.neighbors.append(0)
-			self.bonds.append(0)
-
-		atomj = []
-		atomj.append(0)
-		atomj.append(0)
-		atomj.append(0)
-
-		for iz in idx:
-			for iy in idx:
-				for ix in idx:
-					shiftX = (ix * lattice.a1[0]) + (iy * lattice.a2[0]) + (iz * lattice.a3[0])
-					shiftY = (ix * lattice.a1[1]) + (iy * lattice.a2[1]) + (iz * lattice.a3[1])
-					shiftZ = (ix * lattice.a1[2]) + (iy * lattice.a2[2]) + (iz * lattice.a3[2])
-
-					pointer = 0
-					for i in range(len(atoms)):
-						for j in range(len(atoms)):
-							atomj[0] = atoms[j][0] + shiftX
-							atomj[1] = atoms[j][1] + shiftY
-							atomj[2] = atoms[j][2] + shiftZ
-
-							bij = self.distance( atoms[i],atoms[j] )
-
-							if bij != 0 and bij <= rcut:
-								found = True
-								jc =0
-								if ix == 0 and iy == 0 and iz == 0:
-									self.nbonds += 1
-								jc = self.species_index( species,j )
-								ic = self.species_index( species,i )
-
-								self.set_min_pair(bij,ic,species[i],jc,species[j])
-								self.neighbors[pointer] = j
-								self.bonds[pointer] = bij
-								pointer += 1
-								if pointer >= nsize:
-									print("warning: neighbor overflow")
-									nsize += nsize/5
-									for i in range(nsize/5):
-										self.neighbors.append(0)
-						self.indicies[i+1] = pointer
+	def search_list(self,atoms,lattice,species):
 
-		return found
+		x = np.asarray(atoms,dtype='double')
+		cell = _as_cell( lattice )
+		H,inverse,heights,volume = _cell( cell )
+
+		if len(x) == 0:
+			return False
+
+		# probe a little past the mean interatomic spacing, this holds the
+		# first and usually the second shell. Only widened if no gap shows up
+		probe = PROBE_SCALE*(volume/len(x))**(1.0/3.0)
+
+		if self.jobs > 1:
+			from vaspfileinspector import parallel
+			self.workers = parallel.ParallelSearch( self.jobs )
+
+		self.passes = 0
+		rcut = None
+		try:
+			while rcut is None and self.passes < MAX_PROBE_PASSES:
+				pi,pj,img,bij = self.collect_pairs( x,cell,probe )
+				searched = probe
+				self.passes += 1
+				self.spectrum = distance_spectrum( len(x),pi,bij )
+				rcut = first_shell_cutoff( self.spectrum[1],probe )
+				if rcut is None:
+					probe *= 1.5
+
+			# no shell structure at all, fall back to the first step that
+			# holds a bond as the old incremental search did. A step that
+			# ends past the last probe is searched again to its end
+			if rcut is None and len(bij) > 0:
+				rcut = (np.floor(bij.min()/SPECTRUM_STEP) + 1)*SPECTRUM_STEP
+				if rcut > searched:
+					pi,pj,img,bij = self.collect_pairs( x,cell,rcut )
+					self.passes += 1
+			elif rcut is None:
+				rcut = searched
+		finally:
+			if self.workers is not None:
+				self.workers.close()
+				self.workers = None
+
+		keep = bij <= rcut
+		return self.store_list( len(x),species,rcut,pi[keep],pj[keep],img[keep],bij[keep] )
+
+	# Neighbor list of the next frame of a trajectory.
+	# The pairs within rcut + skin are searched once and kept as candidates,
+	# later frames only refilter them to rcut. The candidates stay complete
+	# until some pair has moved by more than the skin, which is bounded by
+	# twice the largest atomic displacement plus the stretch of the cell, and
+	# only then the search is run again
+	def update(self,atoms,lattice,species):
+
+		x = np.asarray(atoms,dtype='double')
+		cell = _as_cell( lattice )
+		H,inverse,heights,volume = _cell( cell )
+		xs = np.dot(x,inverse)
+
+		# the symmetry of one frame does not carry over to the next
+		self.symmetry = None
+
+		self.frames += 1
+		if self.search and self.rcut == 0:
+			self.search_list( atoms,lattice,species )
+
+		if self.verlet is not None and len(xs) == len(self.verlet["xs"]):
+			# atoms wrapped back into the cell jump by a lattice vector
+			ds = xs - self.verlet["xs"]
+			jump = np.rint(ds)
+			disp = np.dot(ds - jump,H)
+			moved = np.sqrt(np.einsum('ij,ij->i',disp,disp).max()) if len(disp) else 0.0
+			strain = np.linalg.norm(np.dot(self.verlet["inverse"],H) - np.eye(3),2)
+
+			if 2*moved + strain*(self.rcut + self.skin) <= self.skin:
+				pi,pj,img = self.verlet["pairs"]
+				jump = jump.astype(np.int32)
+				img = img - jump[pj] + jump[pi]
+				bij = _pair_distances( x,H,pi,pj,img ).astype(self.dtype)
+				keep = (bij != 0) & (bij <= self.rcut)
+				return self.store_list( len(x),species,self.rcut,pi[keep],pj[keep],img[keep],bij[keep] )
+
+		self.rebuilds += 1
+		pi,pj,img,bij = self.collect_pairs( x,cell,self.rcut + self.skin )
+		self.verlet = {"xs":xs,"inverse":inverse.copy(),"pairs":(pi,pj,img.astype(np.int32))}
+
+		keep = bij <= self.rcut
+		return self.store_list( len(x),species,self.rcut,pi[keep],pj[keep],img[keep],bij[keep] )
+
+	# cell is a Lattice, whose cached inverse and heights the kernels use,
+	# or a bare cell matrix
+	def collect_pairs(self,x,cell,rcut):
+
+		engine = self.select_engine( x,cell,rcut )
+
+		self.unique = len(x)
+		if self.symmetry is not None:
+			pairs = symmetry_pairs( x,cell,rcut,self.symmetry,engine,self.dtype )
+			if pairs is not None:
+				self.unique = len(np.unique(self.symmetry["equivalent"]))
+				return pairs
+
+		if self.workers is not None:
+			pairs,self.parallel = self.workers.collect_pairs( x,cell,rcut,engine,self.dtype )
+			return pairs.arrays()
+		if self.jobs > 1:
+			from vaspfileinspector import parallel
+			pairs,self.parallel = parallel.collect_pairs( x,cell,rcut,engine,self.jobs,self.dtype )
+			return pairs.arrays()
+
+		pairs = PairBuffer( 8*len(x),self.dtype )
+		for block in KERNELS[engine]( x,cell,rcut ):
+			pairs.append( *block )
+
+		return pairs.arrays()
+
+	def store_list(self,natoms,species,rcut,pi,pj,img,bij):
+
+		self.rcut = rcut
+		self.nbonds = 0
+		self.minPair = None
+		self.minBond = 10
 
+		# same ordering as the original 27 image loop
+		order = _canonical_order( pi,pj,img )
+		pi = pi[order]; pj = pj[order]; img = img[order]; bij = bij[order]
+
+		self.indicies = np.zeros(natoms+1,dtype=np.int32)
+		np.cumsum(np.bincount(pi,minlength=natoms),out=self.indicies[1:])
+		self.neighbors = pj
+		self.bonds = bij
+		self.images = img.astype(np.int8,copy=False)
+
+		# bonds inside the home cell
+		self.nbonds = int(np.count_nonzero(~img.any(axis=1)))
+
+		if len(bij) > 0:
+			# first shortest bond in image, i, j order
+			first = np.lexsort((pj,pi,img[:,0],img[:,1],img[:,2],bij))[0]
+			if bij[first] < self.minBond:
+				ids = _species_ids( species )
+				i = pi[first]; j = pj[first]
+				self.set_min_pair(bij[first],ids[i],species[i],ids[j],species[j])
+
+		return len(bij) > 0
+
+	def select_engine( self,x,cell,rcut ):
+		return select_engine( x,cell,rcut,self.engine )
+
+
+# linked cell bins are split in two per cutoff length once a cutoff cube
+# holds this many atoms on average, below that the extra bins cost more
+# than the pairs they save
+DENSE_BIN_ATOMS = 8.0
+
+# largest cell searched with the all pairs kernel when engine is "auto",
+# the linked cell search catches up at about 500 atoms whatever the cutoff
+DIRECT_MAX_ATOMS = 512
+
+
+# all pairs is cheaper for small cells as long as only a few images
+# have to be visited; always one while the minimum image is complete
+def select_engine( x,cell,rcut,engine="auto" ):
+	if engine != "auto":
+		return engine
+	if len(x) > DIRECT_MAX_ATOMS:
+		return "cells"
+	H,inverse,heights,volume = _cell( cell )
+	if 2*rcut < heights.min():
+		return "direct"
+	xs = np.dot(x,inverse)
+	span = xs.max(axis=0) - xs.min(axis=0)
+	if len(_images( H,heights,rcut,-span,span ))*len(x) <= DIRECT_MAX_ATOMS:
+		return "direct"
+	return "cells"
+
+# automatic rcut: histogram bin width (Å), probe radius in units of the
+# mean interatomic spacing and how many times the probe may be widened
+SPECTRUM_STEP = 0.2
+PROBE_SCALE = 1.5
+MAX_PROBE_PASSES = 4
+
+
+# sorted distance spectrum of every atom, as (row pointer, distances)
+def distance_spectrum( natoms,pi,bij ):
+	order = np.lexsort((bij,pi))
+	indptr = np.zeros(natoms+1,dtype=np.intp)
+	np.cumsum(np.bincount(pi,minlength=natoms),out=indptr[1:])
+	return indptr,bij[order]
+
+
+# First shell cutoff from a distance spectrum known up to rmax.
+# The distances are binned in SPECTRUM_STEP wide bins and the cutoff is the
+# first empty bin after the shortest distance. Liquids and glasses rarely
+# have an empty bin so the first minimum of the histogram is used instead.
+# Returns None if neither is found below rmax
+def first_shell_cutoff( bonds,rmax,step=SPECTRUM_STEP ):
+
+	nbins = int(rmax/step)
+	if len(bonds) == 0 or nbins < 2:
+		return None
+
+	hist = np.bincount((bonds/step).astype(np.intp),minlength=nbins)[:nbins]
+	first = int(np.argmax(hist > 0))
+	if hist[first] == 0:
+		return None
+
+	empty = np.nonzero(hist[first:] == 0)[0]
+	if len(empty) > 0:
+		return (first + empty[0])*step
+
+	h = hist[first:]
+	dips = np.nonzero((h[1:-1] < h[:-2]) & (h[1:-1] <= h[2:]))[0]
+	if len(dips) > 0:
+		return (first + 1 + dips[0])*step
+
+	return None
+
+
+# Growable columns of (i, j, image, distance) pairs filled block by block.
+# Capacity doubles when a block does not fit, so appending costs amortized
+# O(1) copies per pair and no Python work per pair
+class PairBuffer:
+	def __init__(self,capacity=1024,dtype='double'):
+		capacity = max(1,int(capacity))
+		self.size = 0
+		self.i = np.empty(capacity,dtype=np.int32)
+		self.j = np.empty(capacity,dtype=np.int32)
+		self.img = np.empty((capacity,3),dtype=np.int8)
+		self.d = np.empty(capacity,dtype=dtype)
+
+	def append(self,pi,pj,img,bij):
+		n = len(pi)
+		if self.size + n > len(self.i):
+			self._grow( self.size + n )
+		end = self.size + n
+		self.i[self.size:end] = pi
+		self.j[self.size:end] = pj
+		self.img[self.size:end] = img
+		self.d[self.size:end] = bij
+		self.size = end
+
+	def arrays(self):
+		n = self.size
+		return self.i[:n],self.j[:n],self.img[:n],self.d[:n]
+
+	def _grow(self,need):
+		capacity = max(need,2*len(self.i))
+		for name in ('i','j','img','d'):
+			old = getattr(self,name)
+			new = np.empty((capacity,)+old.shape[1:],dtype=old.dtype)
+			new[:self.size] = old[:self.size]
+			setattr(self,name,new)
+
+
+# a symmetry reduced search is only tried when the atoms fall into at most
+# this fraction as many orbits
+SYMMETRY_MAX_ORBITS = 0.5
+
+# match tolerance of a mapped position, in units of symprec
+SYMMETRY_MATCH = 1.5
+
+# site lookup grid, at most this many bins per atom
+SITE_GRID_BINS = 64
+
+
+# Atom at a fractional position, within tol (Å) and across the periodic
+# boundaries. Wrapped positions are binned on a grid fine enough for every
+# atom to have a bin of its own; a query is checked against the atom in its
+# own bin first and against the 26 bins around it only if that one is not
+# within tol. owner is None when no such grid was found
+class SiteGrid:
+	def __init__(self,xs,cell,tol):
+
+		H,inverse,heights,volume = _cell( cell )
+		self.xs = xs
+		self.H = H
+		self.tol = tol
+		self.owner = None
+
+		natoms = len(xs)
+		sw = xs - np.floor(xs)
+		width = (volume/max(natoms,1))**(1.0/3.0)
+		while True:
+			nbins = np.maximum(1,np.ceil(heights/width)).astype(np.intp)
+			if nbins.prod() > SITE_GRID_BINS*max(natoms,1) or (heights/nbins).min() <= tol:
+				return
+			lin = self._bins( sw,nbins )
+			if natoms == 0 or np.bincount(lin).max() == 1:
+				break
+			width *= 0.5
+
+		self.nbins = nbins
+		self.owner = np.full(int(nbins.prod()),-1,dtype=np.intp)
+		self.owner[lin] = np.arange(natoms)
+
+		offsets = list(itertools.product((0,-1,1),repeat=3))
+		self.offsets = np.array(offsets,dtype=np.intp)
+
+	def _bins(self,sw,nbins):
+		b = np.minimum((sw*nbins).astype(np.intp),nbins-1)
+		return (b[:,0]*nbins[1] + b[:,1])*nbins[2] + b[:,2]
+
+	# index of the atom at each position, -1 where there is none, and the
+	# lattice image it is found in
+	def lookup(self,q):
+
+		nbins = self.nbins
+		b = np.minimum(((q - np.floor(q))*nbins).astype(np.intp),nbins-1)
+		index = np.full(len(q),-1,dtype=np.intp)
+		image = np.zeros((len(q),3),dtype=np.intp)
+		todo = None
+		for offset in self.offsets:
+			# the own bin of every position first, then the rest around the misses
+			if todo is None:
+				c = b
+				qt = q
+			else:
+				c = (b[todo] + offset) % nbins
+				qt = q[todo]
+			cand = self.owner[(c[:,0]*nbins[1] + c[:,1])*nbins[2] + c[:,2]]
+			ds = qt - self.xs[cand]
+			im = np.rint(ds)
+			dx = np.dot(ds - im,self.H)
+			hit = (cand >= 0) & (np.einsum('ij,ij->i',dx,dx) <= self.tol*self.tol)
+			if todo is None:
+				index[hit] = cand[hit]
+				image[hit] = im[hit]
+				todo = np.nonzero(~hit)[0]
+			else:
+				index[todo[hit]] = cand[hit]
+				image[todo[hit]] = im[hit]
+				todo = todo[~hit]
+			if len(todo) == 0:
+				break
+		return index,image
+
+
+# Operation and lattice translation taking the unique atom of every orbit
+# onto each atom a of the orbit, R.xs[unique] + t = xs[a] + lift[a].
+# None if some atom is not reached
+def _orbit_operations( xs,grid,rotations,translations,equivalent ):
+
+	natoms = len(xs)
+	op = np.full(natoms,-1,dtype=np.intp)
+	lift = np.zeros((natoms,3),dtype=np.intp)
+	for r in np.unique(equivalent):
+		q = np.dot(rotations,xs[r]) + translations
+		index,image = grid.lookup(q)
+		hit = np.nonzero(index >= 0)[0]
+		hit = hit[equivalent[index[hit]] == r]
+		reached,first = np.unique(index[hit],return_index=True)
+		op[reached] = hit[first]
+		lift[reached] = image[hit[first]]
+
+	if (op < 0).any():
+		return None
+	return op,lift
+
+
+# Symmetry reduced pair search.
+# Only the unique atoms of every orbit are searched. An operation taking the
+# unique atom onto another atom of its orbit takes the neighbors along: the
+# separations of the unique atom are rotated once per distinct rotation and
+# added to the position of every atom reached with it. The neighbors are
+# then identified by their position and the distances are evaluated again
+# from the positions, so the list is the one the full search finds. The
+# unique atoms are searched a little past rcut since the operations hold
+# only within symprec and the inverse of an operation may stretch distances
+# slightly in a cell that is not exactly symmetric.
+# Returns (i, j, image, distance) as collect_pairs or None when the
+# structure does not map onto itself
+def symmetry_pairs( x,cell,rcut,symmetry,engine,dtype='double',block=1<<20 ):
+
+	natoms = len(x)
+	equivalent = symmetry["equivalent"]
+	if natoms == 0 or rcut <= 0 or len(equivalent) != natoms:
+		return None
+	unique = np.unique(equivalent)
+	if len(unique) > SYMMETRY_MAX_ORBITS*natoms:
+		return None
+
+	rotations = symmetry["rotations"]
+	translations = symmetry["translations"]
+	H,inverse,heights,volume = _cell( cell )
+	xs = np.dot(x,inverse)
+	tol = max(SYMMETRY_MATCH*symmetry["symprec"],1e-8)
+	grid = SiteGrid( xs,cell,tol )
+	if grid.owner is None:
+		return None
+	orbits = _orbit_operations( xs,grid,rotations,translations,equivalent )
+	if orbits is None:
+		return None
+	op,lift = orbits
+
+	# distinct rotations in use, their Cartesian form H^-1.R^T.H and the
+	# most the inverse of any of them stretches a distance
+	code = np.dot(rotations.reshape(-1,9) + 32,64**np.arange(9,dtype=np.int64))
+	used,rclass = np.unique(code[op],return_inverse=True)
+	rclass = rclass.reshape(-1)
+	first = np.zeros(len(used),dtype=np.intp)
+	first[rclass] = np.arange(natoms)
+	R = rotations[op[first]]
+	M = np.matmul(np.matmul(inverse,R.transpose(0,2,1)),H)
+	sv = np.linalg.svd(M,compute_uv=False)
+	reach = (rcut + 2*tol)/sv.min()
+
+	found = PairBuffer( 8*len(unique),dtype )
+	for pairs in KERNELS[engine]( x,cell,reach,block,subset=unique ):
+		found.append( *pairs )
+	pi,pj,img,bij = found.arrays()
+
+	# two neighbors taken to the same atom would need atoms closer than
+	# the match tolerance
+	if len(bij) > 0 and bij.min()*sv.min() <= 2*tol:
+		return None
+
+	order = np.argsort(pi,kind='stable')
+	ptr = np.zeros(natoms+1,dtype=np.intp)
+	np.cumsum(np.bincount(pi,minlength=natoms),out=ptr[1:])
+	sep = xs[pj[order]] + img[order] - xs[pi[order]]
+
+	# separations of every unique atom under every rotation that is used
+	# with it, and where each atom finds them
+	key = equivalent*len(used) + rclass
+	keys,group = np.unique(key,return_inverse=True)
+	group = group.reshape(-1)
+	krep = keys//len(used)
+	kcount = ptr[krep+1] - ptr[krep]
+	kptr = np.zeros(len(keys)+1,dtype=np.intp)
+	np.cumsum(kcount,out=kptr[1:])
+	k = np.repeat(np.arange(len(keys)),kcount)
+	e = ptr[krep[k]] + np.arange(kptr[-1]) - kptr[k]
+	rotated = np.einsum('nij,nj->ni',R[keys[k]%len(used)],sep[e])
+
+	# positions the unique atoms are taken to, within symprec of the atoms
+	base = np.einsum('nij,nj->ni',rotations[op],xs[equivalent]) + translations[op] - lift
+
+	count = kcount[group]
+	bounds = np.cumsum(count)
+	pairs = PairBuffer( bounds[-1],dtype )
+	a0 = 0
+	while a0 < natoms:
+		start = bounds[a0-1] if a0 > 0 else 0
+		a1 = max(a0+1,int(np.searchsorted(bounds,start+block,side='right')))
+
+		n = count[a0:a1]
+		a = np.repeat(np.arange(a0,a1),n)
+		local = np.arange(bounds[a1-1]-start) - np.repeat(bounds[a0:a1]-n-start,n)
+		q = base[a] + rotated[kptr[group[a]] + local]
+
+		j,im = grid.lookup(q)
+		if (j < 0).any():
+			return None
+		d = _pair_distances( x,H,a,j,im )
+		keep = (d != 0) & (d <= rcut)
+		pairs.append( a[keep],j[keep],im[keep],d[keep] )
+		a0 = a1
+
+	pi,pj,img,bij = pairs.arrays()
+
+	# every bond is seen from both of its atoms
+	if not np.array_equal(np.bincount(pi,minlength=natoms),np.bincount(pj,minlength=natoms)):
+		return None
+
+	return pi,pj,img,bij
+
+
+# order pairs as the brute force loop over images visits them;
+# by atom i, then image (z,y,x) and then atom j
+def _canonical_order( pi,pj,img ):
+	return np.lexsort((pj,img[:,0],img[:,1],img[:,2],pi))
+
+
+# per species running index, Si1 Si2 ... O1 O2, see Neighbors.species_index
+def _species_ids( species ):
+	ids = []
+	seen = {}
+	for s in species:
+		seen[s] = seen.get(s,0) + 1
+		ids.append(seen[s])
+	return ids
+
+
+# k-th of nparts consecutive slices holding about equal total weight
+def _part_slice( weights,k,nparts ):
+	total = np.cumsum(weights)
+	if len(total) == 0:
+		return slice(0,0)
+	cuts = np.searchsorted(total,total[-1]*np.arange(1,nparts)/float(nparts),side='right')
+	edges = np.concatenate(([0],cuts,[len(total)]))
+	return slice(int(edges[k]),int(edges[k+1]))
+
+
+# a Lattice is passed on as it is for its cached arrays, anything else as
+# a bare cell matrix
+def _as_cell( lattice ):
+	if getattr(lattice,"inverse",None) is not None:
+		return lattice
+	return np.asarray(getattr(lattice,"H",lattice),dtype='double')
+
+# cell matrix, inverse, perpendicular distance between opposite faces and
+# volume; cached on a Lattice, computed for a bare matrix
+def _cell( cell ):
+	inverse = getattr(cell,"inverse",None)
+	if inverse is not None:
+		return cell.H,inverse,cell.heights,cell.volume
+	H = np.asarray(cell,dtype='double')
+	inverse = np.linalg.inv(H)
+	return H,inverse,1.0/np.linalg.norm(inverse,axis=0),abs(np.linalg.det(H))
+
+
+# Shortest Cartesian length of f.H over the fractional box lo <= f <= hi.
+# The minimum of the convex quadratic lies at one of the 27 combinations of
+# each component held at a bound or left free, so trying them all is exact
+def _box_distance( H,lo,hi ):
+
+	lo = np.asarray(lo,dtype='double')
+	hi = np.asarray(hi,dtype='double')
+
+	best = np.inf
+	for state in itertools.product((0,1,2),repeat=3):
+		f = np.where(np.array(state) == 0,lo,hi)
+		free = [a for a in range(3) if state[a] == 2]
+		if free:
+			fixed = [a for a in range(3) if state[a] != 2]
+			rhs = -np.dot(f[fixed],H[fixed])
+			sol = np.linalg.lstsq(H[free].T,rhs,rcond=None)[0]
+			if (sol < lo[free]).any() or (sol > hi[free]).any():
+				continue
+			f[free] = sol
+		best = min(best,np.linalg.norm(np.dot(f,H)))
+	return best
+
+
+# Lattice translations T that can hold a pair within rcut when the fractional
+# separations of the pairs lie within [lo, hi]. The range follows from the
+# cell heights and every candidate image is dropped with a bounding test
+# when no point of its box T + [lo, hi] is within rcut
+def _images( H,heights,rcut,lo,hi ):
+
+	reach = rcut/heights
+	first = np.ceil(-reach - hi).astype(int)
+	last = np.floor(reach - lo).astype(int)
+
+	images = []
+	for tz in range(first[2],last[2]+1):
+		for ty in range(first[1],last[1]+1):
+			for tx in range(first[0],last[0]+1):
+				T = np.array((tx,ty,tz))
+				if _box_distance( H,T+lo,T+hi ) <= rcut:
+					images.append(T)
+	return images
+
+
+# separation of atom j (shifted by its lattice image) from atom i, evaluated
+# term by term in the same order as the original image loop
+def _pair_distances( x,H,pi,pj,img ):
+	shift = img[:,0:1]*H[0] + img[:,1:2]*H[1] + img[:,2:3]*H[2]
+	dr = x[pi] - (x[pj] + shift)
+	return np.sqrt(dr[:,0]*dr[:,0] + dr[:,1]*dr[:,1] + dr[:,2]*dr[:,2])
+
+
+# Linked cell search.
+# Atoms are binned in fractional coordinates with bins rcut or rcut/2 wide
+# (measured perpendicular to the faces, see DENSE_BIN_ATOMS). Finer bins
+# follow the cutoff sphere more closely and compare fewer pairs; the reach
+# extends over as many bins as needed and bin offsets that cannot hold a
+# pair are dropped before any per atom work. Candidates are screened on
+# the wrapped positions first, the exact distance is only evaluated for
+# the pairs that pass.
+# Neighbor bins wrap across the periodic boundaries and the wrap is recorded
+# as the lattice image of atom j.
+# Yields blocks of (i, j, image, distance) for 0 < distance <= rcut.
+# With part = (k, nparts) only atoms i in the k-th of nparts slabs of bins
+# are searched, see parallel.py. With subset only the atoms i listed in it
+def cell_list_pairs( x,cell,rcut,block=1<<20,part=None,subset=None ):
+
+	natoms = len(x)
+	if natoms == 0 or rcut <= 0:
+		return
+
+	H,inverse,heights,volume = _cell( cell )
+	xs = np.dot(x,inverse)
+	wrap = np.floor(xs)
+	sw = xs - wrap
+	wrap = wrap.astype(np.intp)
+
+	# bins per direction, capped near the number of atoms so tiny
+	# radii do not produce mostly empty bins
+	divisions = 1
+	if natoms*rcut**3/volume >= DENSE_BIN_ATOMS:
+		divisions = 2
+	nbins = np.maximum(1,np.floor(divisions*heights/rcut)).astype(np.intp)
+	maxbins = 2*natoms + 27
+	if nbins.prod() > maxbins:
+		f = (maxbins/float(nbins.prod()))**(1.0/3.0)
+		nbins = np.maximum(1,np.floor(nbins*f)).astype(np.intp)
+
+	bcoord = np.minimum((sw*nbins).astype(np.intp),nbins-1)
+	lin = (bcoord[:,0]*nbins[1] + bcoord[:,1])*nbins[2] + bcoord[:,2]
+
+	nbtot = int(nbins.prod())
+	sorted_atoms = np.argsort(lin,kind='stable')
+	xsorted = np.dot(sw[sorted_atoms],H)
+	counts = np.bincount(lin,minlength=nbtot)
+	start = np.zeros(nbtot,dtype=np.intp)
+	np.cumsum(counts[:-1],out=start[1:])
+
+	# bins of the atoms i, the same as those of the atoms j unless a subset
+	sortedA,xsortedA,countsA,startA = sorted_atoms,xsorted,counts,start
+	if subset is not None:
+		subset = np.asarray(subset,dtype=np.intp)
+		sortedA = subset[np.argsort(lin[subset],kind='stable')]
+		xsortedA = np.dot(sw[sortedA],H)
+		countsA = np.bincount(lin[subset],minlength=nbtot)
+		startA = np.zeros(nbtot,dtype=np.intp)
+		np.cumsum(countsA[:-1],out=startA[1:])
+
+	occupied = np.nonzero(countsA)[0]
+	if part is not None:
+		occupied = occupied[_part_slice( countsA[occupied],*part )]
+	ocoord = np.stack(np.unravel_index(occupied,tuple(nbins)),axis=1)
+
+	# bin offsets, the bins themselves act as a small cell and two atoms
+	# in bins "offset" apart are separated by (offset + (-1,1)) bins
+	Hbin = H/nbins[:,None]
+	offsets = _images( Hbin,heights/nbins,rcut,-np.ones(3),np.ones(3) )
+
+	for offset in offsets:
+		nc = ocoord + offset
+		shift = np.floor_divide(nc,nbins)
+		nc -= shift*nbins
+		other = (nc[:,0]*nbins[1] + nc[:,1])*nbins[2] + nc[:,2]
+
+		keep = counts[other] > 0
+		binA = occupied[keep]
+		binB = other[keep]
+		shift = shift[keep]
+		cshift = np.dot(shift,H)
+
+		ca = countsA[binA]
+		cb = counts[binB]
+		npairs = ca*cb
+		bounds = np.cumsum(npairs)
+
+		# split the bin pairs into blocks of about "block" candidates
+		k0 = 0
+		while k0 < len(binA):
+			base = bounds[k0-1] if k0 > 0 else 0
+			k1 = int(np.searchsorted(bounds,base+block,side='right'))
+			k1 = max(k1,k0+1)
+
+			n = npairs[k0:k1]
+			k = np.repeat(np.arange(k0,k1),n)
+			local = np.arange(bounds[k1-1]-base) - np.repeat(bounds[k0:k1]-n-base,n)
+			ia = startA[binA[k]] + local//cb[k]
+			jb = start[binB[k]] + local%cb[k]
+
+			dr = xsortedA[ia] - (xsorted[jb] + cshift[k])
+			d2 = np.einsum('ij,ij->i',dr,dr)
+			hit = d2 <= rcut*rcut*(1.0 + 1e-10)
+			k0 = k1
+			if not hit.any():
+				continue
+
+			k = k[hit]
+			pi = sortedA[ia[hit]]
+			pj = sorted_atoms[jb[hit]]
+			img = shift[k] - wrap[pj] + wrap[pi]
+
+			bij = _pair_distances( x,H,pi,pj,img )
+			mask = (bij != 0) & (bij <= rcut)
+			if mask.any():
+				yield pi[mask],pj[mask],img[mask],bij[mask]
+
+
+# All pairs minimum image search.
+# Rows of atoms are processed in blocks of about "block" pairs, the fractional
+# separations are wrapped to the nearest image and converted to Cartesian with
+# the cell matrix.  Only valid for rcut < min(cell heights)/2 where at most one
+# image of each atom can be within rcut.
+# Yields blocks of (i, j, image, distance) for 0 < distance <= rcut.
+# With part = (k, nparts) only the k-th of nparts ranges of atoms i, with
+# subset only the atoms i listed in it
+def minimum_image_pairs( x,cell,rcut,block=1<<20,part=None,subset=None ):
+
+	natoms = len(x)
+	if natoms == 0 or rcut <= 0:
+		return
+
+	H,inverse,heights,volume = _cell( cell )
+	xs = np.dot(x,inverse)
+	rows = max(1,block//natoms)
+	allj = np.arange(natoms)
+	alli = allj if subset is None else np.asarray(subset,dtype=np.intp)
+
+	first,last = 0,len(alli)
+	if part is not None:
+		sl = _part_slice( np.ones(len(alli)),*part )
+		first,last = sl.start,sl.stop
+
+	for i0 in range(first,last,rows):
+		i1 = min(last,i0+rows)
+
+		ds = xs[None,:,:] - xs[alli[i0:i1],None,:]
+		img = -np.rint(ds)
+		dx = np.dot(ds + img,H)
+		d2 = np.einsum('ijk,ijk->ij',dx,dx)
+
+		# loose screen, the exact distance is evaluated below
+		ii,jj = np.nonzero(d2 <= rcut*rcut*(1.0 + 1e-10))
+		if len(ii) == 0:
+			continue
+		img = img[ii,jj].astype(np.intp)
+		pi = alli[ii + i0]
+		pj = allj[jj]
+
+		bij = _pair_distances( x,H,pi,pj,img )
+		mask = (bij != 0) & (bij <= rcut)
+		if mask.any():
+			yield pi[mask],pj[mask],img[mask],bij[mask]
+
+
+# All pairs search over explicit lattice images, for cells too small for the
+# minimum image. Only the images whose box of separations can reach within
+# rcut of the atoms actually present are visited; for a slab in vacuum that
+# drops every image across the vacuum before any distance is computed
+def image_pairs( x,cell,rcut,block=1<<20,part=None,subset=None ):
+
+	natoms = len(x)
+	if natoms == 0 or rcut <= 0:
+		return
+
+	H,inverse,heights,volume = _cell( cell )
+	xs = np.dot(x,inverse)
+	rows = max(1,block//natoms)
+	allj = np.arange(natoms)
+	alli = allj if subset is None else np.asarray(subset,dtype=np.intp)
+
+	first,last = 0,len(alli)
+	if part is not None:
+		sl = _part_slice( np.ones(len(alli)),*part )
+		first,last = sl.start,sl.stop
+
+	span = xs.max(axis=0) - xs.min(axis=0)
+	for T in _images( H,heights,rcut,-span,span ):
+		for i0 in range(first,last,rows):
+			i1 = min(last,i0+rows)
+
+			dx = np.dot(xs[None,:,:] + T - xs[alli[i0:i1],None,:],H)
+			d2 = np.einsum('ijk,ijk->ij',dx,dx)
+
+			ii,jj = np.nonzero(d2 <= rcut*rcut*(1.0 + 1e-10))
+			if len(ii) == 0:
+				continue
+			pi = alli[ii + i0]
+			pj = allj[jj]
+			img = np.repeat(T[None,:],len(ii),axis=0)
+
+			bij = _pair_distances( x,H,pi,pj,img )
+			mask = (bij != 0) & (bij <= rcut)
+			if mask.any():
+				yield pi[mask],pj[mask],img[mask],bij[mask]
+
+
+# minimum image while it is complete, explicit images otherwise
+def direct_pairs( x,cell,rcut,block=1<<20,part=None,subset=None ):
+	cell = _as_cell( cell )
+	if 2*rcut < _cell( cell )[2].min():
+		return minimum_image_pairs( x,cell,rcut,block,part,subset )
+	return image_pairs( x,cell,rcut,block,part,subset )
+
+
+KERNELS = {
+	"direct" : direct_pairs,
+	"cells" : cell_list_pairs,
+}
@@ -0,0 +1,183 @@
+# -*- coding: utf-8 -*-
+
+import os
+import time
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+
+from vaspfileinspector.neighbors import (KERNELS,PairBuffer,_cell)
+
+# Parallel neighbor search.
+# The positions and the cell matrix are published once through shared
+# memory, the atoms are cut into spatial slabs (see neighbors._part_slice)
+# and every worker searches the pairs of the atoms in its slabs. The parts
+# are merged into one PairBuffer, Neighbors.store_list puts them in the same
+# order as the serial search.
+
+# parts handed out per worker, extra parts even out slabs of unequal cost,
+# and the fewest atoms worth a part of their own
+PARTS_PER_JOB = 4
+PART_MIN_ATOMS = 1000
+
+# guess (s) for pool startup plus merge, used until one has been measured
+PARALLEL_OVERHEAD = 0.25
+
+# guess (s) of the serial search per atom and per expected pair, refined
+# after every serial search that takes long enough to be timed
+SEARCH_COST = 1.5e-6
+TIMER_FLOOR = 0.01
+
+# measured overhead for each pool size, refined after every parallel run
+_overhead = {}
+
+# measured serial cost per atom and pair
+_cost = {}
+
+# arrays mapped by a worker process
+_shared = {}
+
+
+def _attach( layout ):
+	for key,(name,shape) in layout.items():
+		shm = shared_memory.SharedMemory(name=name)
+		_shared[key] = (shm,np.ndarray(shape,dtype='double',buffer=shm.buf))
+
+
+def _ready( k ):
+	return k
+
+
+def _search( x,H,rcut,engine,dtype,k,nparts ):
+	pairs = PairBuffer( 8*len(x)//nparts + 1,dtype )
+	for block in KERNELS[engine]( x,H,rcut,part=(k,nparts) ):
+		pairs.append( *block )
+	return pairs.arrays()
+
+
+def _search_part( args ):
+	x = _shared['x'][1]
+	H = _shared['H'][1]
+	return _search( x,H,*args )
+
+
+def _publish( arrays ):
+	blocks = {}
+	layout = {}
+	for key,a in arrays.items():
+		a = np.ascontiguousarray(a,dtype='double')
+		shm = shared_memory.SharedMemory(create=True,size=max(1,a.nbytes))
+		np.ndarray(a.shape,dtype='double',buffer=shm.buf)[...] = a
+		blocks[key] = shm
+		layout[key] = (shm.name,a.shape)
+	return blocks,layout
+
+
+# cpus this process may run on, more workers than that only compete
+def available_cpus():
+	try:
+		return len(os.sched_getaffinity(0))
+	except AttributeError:
+		return os.cpu_count() or 1
+
+
+# atoms plus the pairs within rcut expected at the mean density, what the
+# time of a search grows with
+def search_work( x,cell,rcut ):
+	natoms = len(x)
+	volume = _cell( cell )[3]
+	if volume == 0:
+		return float(natoms)
+	return natoms + natoms*natoms/volume*4.0/3.0*np.pi*rcut**3
+
+
+# A pool of workers kept for several searches on the same positions, the
+# probe passes of the automatic cutoff reuse one pool. Nothing is started
+# until a search is estimated to be worth it: small cells, or a serial
+# time below the cost of starting the workers and merging their results,
+# run as one serial search here
+class ParallelSearch:
+	def __init__(self,jobs):
+		self.jobs = min(jobs,available_cpus())
+		self.pool = None
+		self.blocks = None
+		self.x = None
+		self.H = None
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*exc):
+		self.close()
+
+	def close(self):
+		if self.pool is not None:
+			self.pool.terminate()
+			self.pool.join()
+			self.pool = None
+		if self.blocks is not None:
+			for shm in self.blocks.values():
+				shm.close()
+				shm.unlink()
+			self.blocks = None
+		self.x = None
+		self.H = None
+
+	# Returns the filled PairBuffer and a dict with the timings of the run,
+	# cell is a Lattice or a bare cell matrix as for the kernels
+	def collect_pairs( self,x,cell,rcut,engine,dtype='double' ):
+
+		nparts = max(1,min(self.jobs*PARTS_PER_JOB,len(x)//PART_MIN_ATOMS))
+		jobs = min(self.jobs,nparts)
+		stats = {"jobs":jobs,"parts":1,"startup":0.0,"merge":0.0,"serial":True}
+
+		work = search_work( x,cell,rcut )
+		serial = work*_cost.get("work",SEARCH_COST)
+		if jobs < 2 or serial/jobs + _overhead.get(jobs,PARALLEL_OVERHEAD) >= serial:
+			t0 = time.perf_counter()
+			pairs = PairBuffer( 8*len(x),dtype )
+			for block in KERNELS[engine]( x,cell,rcut ):
+				pairs.append( *block )
+			elapsed = time.perf_counter() - t0
+			if elapsed > TIMER_FLOOR:
+				_cost["work"] = elapsed/work
+			return pairs,stats
+
+		stats["serial"] = False
+		t0 = time.perf_counter()
+		started = self._start( x,_cell( cell )[0],jobs )
+		stats["startup"] = time.perf_counter() - t0
+
+		pairs = PairBuffer( 8*len(x),dtype )
+		tasks = [(rcut,engine,dtype,k,nparts) for k in range(nparts)]
+		merge = 0.0
+		for part in self.pool.imap( _search_part,tasks ):
+			t1 = time.perf_counter()
+			pairs.append( *part )
+			merge += time.perf_counter() - t1
+		stats["merge"] = merge
+		stats["parts"] = nparts
+
+		# a pool that was already running says nothing about the startup
+		if started:
+			_overhead[jobs] = stats["startup"] + stats["merge"]
+		return pairs,stats
+
+	# workers with x and H mapped, kept while the positions stay the same,
+	# True when a new pool was started
+	def _start( self,x,H,jobs ):
+		if self.pool is not None and x is self.x and np.array_equal(H,self.H):
+			return False
+		self.close()
+		self.blocks,layout = _publish( {"x":x,"H":H} )
+		self.x = x
+		self.H = np.array(H)
+		self.pool = mp.Pool( jobs,initializer=_attach,initargs=(layout,) )
+		self.pool.map( _ready,range(jobs),chunksize=1 )
+		return True
+
+
+# one parallel search, see ParallelSearch
+def collect_pairs( x,cell,rcut,engine,jobs,dtype='double' ):
+	with ParallelSearch( jobs ) as search:
+		return search.collect_pairs( x,cell,rcut,engine,dtype )
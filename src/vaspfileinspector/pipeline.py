@@ -0,0 +1,218 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+# Staged analysis of one structure file.
+# inspect() returns an Inspection right away, nothing is read yet. Every
+# section (structure, composition, cell, symmetry, neighbors, bonds ...) is
+# computed the first time it is touched and kept. A section names the
+# sections it is built from, those are computed first, so asking for the
+# bonds reads the file and runs the neighbor search but never calls spglib.
+# The time spent in each section itself, without the sections it pulled in,
+# goes to Inspection.timings in the order they ran.
+#
+#   result = inspect("POSCAR",rcut=2.5)
+#   result.bonds["nbonds"], result.timings
+#
+# Modules are imported by the sections that use them, importing this one
+# costs nothing. A profiling.Profiler passed in also gets the memory of
+# every section.
+
+
+# a lazily computed, memoized section that needs the sections in requires
+def stage(*requires):
+	def wrap(compute):
+		name = compute.__name__
+		def get(self):
+			if name not in self._values:
+				for r in requires:
+					getattr(self,r)
+				t0 = time.perf_counter()
+				inner = self._inner
+				if self.profiler is not None:
+					self.profiler.begin(name)
+				try:
+					value = compute(self)
+				finally:
+					if self.profiler is not None:
+						self.profiler.end()
+				elapsed = time.perf_counter() - t0
+				self._values[name] = value
+				self.timings[name] = elapsed - (self._inner - inner)
+				self._inner = inner + elapsed
+			return self._values[name]
+		get.requires = requires
+		return property(get,doc=name)
+	return wrap
+
+
+class Inspection:
+	def __init__(self,path,frame=-1,rcut=0.0,symprec=0.05,jobs=1,symmetric=False,
+	             rmax=6.0,rbins=120,tolerances=None,cache=True,profiler=None):
+
+		self.path = path
+		self.frame = frame
+		self.rcut = rcut
+		self.symprec = symprec
+		self.jobs = jobs
+		self.symmetric = symmetric
+		self.rmax = rmax
+		self.rbins = rbins
+		self.tolerances = tolerances
+
+		# True: the default cache directory, False: no cache, or a Cache
+		self.cache = cache
+
+		# profiling.Profiler told about every section, see --profile
+		self.profiler = profiler
+
+		# open Trajectory for an XDATCAR, see structure
+		self.trajectory = None
+
+		self.timings = {}
+		self._values = {}
+		self._inner = 0.0
+
+	# sections and the sections each one needs
+	@classmethod
+	def stages(cls):
+		return dict((name,attr.fget.requires) for name,attr in vars(cls).items()
+		            if isinstance(attr,property) and hasattr(attr.fget,"requires"))
+
+	# names of the sections computed so far
+	def computed(self):
+		return list(self._values)
+
+	def close(self):
+		if self.trajectory is not None:
+			self.trajectory.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self,*exc):
+		self.close()
+
+	def _cache(self):
+		if self.cache is True or self.cache is False:
+			from vaspfileinspector.cache import Cache
+			self.cache = Cache(enabled=self.cache)
+		return self.cache
+
+	# data[0] -> lattice
+	# data[1] -> positions  in angstrom
+	# data[2] -> species
+	# data[3] -> ntypes
+	# data[4] -> (a)tomic (n)umber(s)
+	@stage()
+	def structure(self):
+		from vaspfileinspector import reader, trajectory
+		cache = self._cache()
+		if trajectory.is_xdatcar( self.path ):
+			self.trajectory = trajectory.Trajectory( self.path )
+			frame = self.frame
+			return cache.structure( self.path,frame,lambda: self.trajectory[frame] )
+		self.frame = None
+		return cache.structure( self.path,None,lambda: reader.read_vasp( self.path ) )
+
+	@stage("structure")
+	def lattice(self):
+		from vaspfileinspector.lattice import Lattice
+		return Lattice(self.structure[0])
+
+	@stage("structure","lattice")
+	def atoms(self):
+		from vaspfileinspector.atoms import Atoms
+		data = self.structure
+		return Atoms(self.lattice,None,data[2],data[1],data[4],data[3],fractional=False)
+
+	@stage("atoms")
+	def composition(self):
+		atoms = self.atoms
+		return {"compound":atoms.get_compound(),
+		        "natoms":atoms.get_number_of_atoms(),
+		        "species":list(atoms.unq),
+		        "counts":list(atoms.ntypes),
+		        "density":float(atoms.get_density()) if atoms.masses is not None else None}
+
+	# combined structural data in the form spglib takes it
+	@stage("lattice","atoms")
+	def cell(self):
+		return (self.lattice.H,self.atoms.xs,self.structure[4])
+
+	# spglib dataset, the space group is also set on the lattice
+	@stage("cell")
+	def symmetry(self):
+		cell = self.cell
+		def analyze():
+			import spglib
+			return spglib.get_symmetry_dataset(cell,self.symprec)
+		dataset = self._cache().symmetry( self.path,self.frame,self.symprec,analyze )
+		self.lattice.analyze_symmetry(cell,self.symprec,dataset)
+		return dataset
+
+	@stage("cell")
+	def sweep(self):
+		from vaspfileinspector.symmetry import (SymmetrySweep,SWEEP_TOLERANCES)
+		sweep = SymmetrySweep(self.tolerances or SWEEP_TOLERANCES)
+		sweep.run(self.cell,self._cache(),self.path,self.frame,self.jobs)
+		return sweep
+
+	# the symmetric search needs the symmetry only when the list is not
+	# cached, so it is not a declared dependency
+	@stage("atoms","lattice")
+	def neighbors(self):
+		from vaspfileinspector.neighbors import Neighbors
+		nn = Neighbors(self.rcut,jobs=self.jobs)
+		def find():
+			if self.symmetric:
+				nn.set_symmetry(self.symmetry,self.symprec)
+			return nn.find(self.atoms.x,self.lattice,self.structure[2],self.rcut)
+		self._cache().neighbors( self.path,self.frame,nn,find )
+		return nn
+
+	@stage("neighbors")
+	def bonds(self):
+		nn = self.neighbors
+		minPair,minBond = nn.get_min_pair()
+		return {"nbonds":nn.nbonds,
+		        "rcut":float(nn.rcut),
+		        "min_bond":float(minBond) if minPair is not None else None,
+		        "min_pair":minPair}
+
+	@stage("neighbors","atoms")
+	def topology(self):
+		from vaspfileinspector.topology import Topology
+		topo = Topology()
+		topo.analyze(self.neighbors,self.atoms)
+		return topo
+
+	# averaged over every frame of an XDATCAR
+	@stage("atoms")
+	def rdf(self):
+		from vaspfileinspector.rdf import RDF
+		rdf = RDF(self.rmax,self.rbins)
+		if self.trajectory is None:
+			rdf.accumulate(self.atoms)
+			return rdf
+
+		import numpy as np
+		from vaspfileinspector.lattice import Lattice
+		from vaspfileinspector.atoms import Atoms
+		# the cell is set up again only when it changes
+		flattice = self.lattice
+		for fdata in self.trajectory:
+			if not np.array_equal(fdata[0],flattice.H):
+				flattice = Lattice(fdata[0])
+			rdf.accumulate(Atoms(flattice,None,fdata[2],fdata[1],fdata[4],fdata[3],fractional=False))
+		return rdf
+
+	# spglib (lattice, positions, numbers) of the primitive cell
+	@stage("cell")
+	def primitive(self):
+		import spglib
+		return spglib.find_primitive( self.cell,self.symprec )
+
+
+def inspect(path,**options):
+	return Inspection(path,**options)
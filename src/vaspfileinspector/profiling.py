@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+
+import sys
+import time
+import json
+import tracemalloc
+
+# Per stage time and memory of a run, see --profile.
+# Stages nest (the neighbor search pulls in the structure), the time of a
+# stage is its own time without the stages it started, the peak is the
+# largest traced memory above what was in use when it started, including
+# its inner stages. Memory is traced with tracemalloc, which slows numpy
+# heavy stages down somewhat; the times are meant for comparing stages.
+
+
+class Profiler:
+	def __init__(self,enabled=True):
+
+		self.enabled = enabled
+		self.rows = []
+		self.extra = {}
+		self.peak = 0
+		self._stack = []
+		self.t0 = time.perf_counter()
+
+		if enabled and not tracemalloc.is_tracing():
+			tracemalloc.start()
+
+	def begin(self,name):
+		if not self.enabled:
+			return
+		current,peak = tracemalloc.get_traced_memory()
+		self.peak = max(self.peak,peak)
+		if self._stack:
+			self._stack[-1]["peak"] = max(self._stack[-1]["peak"],peak)
+		tracemalloc.reset_peak()
+		self._stack.append({"name":name,"start":time.perf_counter(),"inner":0.0,
+		                    "base":current,"peak":current})
+
+	def end(self):
+		if not self.enabled:
+			return
+		current,peak = tracemalloc.get_traced_memory()
+		self.peak = max(self.peak,peak)
+		entry = self._stack.pop()
+		entry["peak"] = max(entry["peak"],peak)
+		elapsed = time.perf_counter() - entry["start"]
+		if self._stack:
+			self._stack[-1]["inner"] += elapsed
+			self._stack[-1]["peak"] = max(self._stack[-1]["peak"],entry["peak"])
+		self.rows.append({"stage":entry["name"],"seconds":elapsed - entry["inner"],
+		                  "peak_mb":(entry["peak"] - entry["base"])/1e6})
+
+	def stage(self,name):
+		return _Stage(self,name)
+
+	# neighbor search iterations and pair rate of a Neighbors object
+	def add_neighbors(self,nn):
+		if not self.enabled or nn is None:
+			return
+		pairs = len(nn.bonds)
+		# the rate is over the search alone, the neighbors stage also holds
+		# its imports. A list read from the cache was not searched in this
+		# run, it is reported with no passes and no rate
+		seconds = getattr(nn,"seconds",0.0)
+		cached = getattr(nn,"cached",False)
+		searched = not cached and seconds > 0
+		self.extra["neighbors"] = {"cached":cached,
+		                           "passes":0 if cached else getattr(nn,"passes",0),
+		                           "unique":nn.unique if nn.symmetry is not None else None,
+		                           "pairs":pairs,
+		                           "rcut":float(nn.rcut),
+		                           "pairs_per_second":pairs/seconds if searched else None}
+
+	def report(self,filename=None):
+		total = time.perf_counter() - self.t0
+		if self.enabled:
+			self.peak = max(self.peak,tracemalloc.get_traced_memory()[1])
+		return {"file":filename,"total_seconds":total,"peak_mb":self.peak/1e6,
+		        "stages":self.rows,"neighbors":self.extra.get("neighbors")}
+
+	def show_info(self,parameters,fmt="table"):
+
+		report = self.report(parameters.FILE)
+
+		if parameters.save:
+			name = parameters.compound + ".profile"
+			out = open(name,'w')
+		else:
+			out = sys.stderr
+		try:
+			if fmt == "json":
+				out.write(json.dumps(report) + '\n')
+				return
+
+			if out is sys.stderr:
+				out.write('\n' + "/*-- Profile --*/" + '\n')
+			else:
+				out.write("/*-- Profile --*/" + '\n')
+			out.write("Structure     = %s    " % parameters.FILE + '\n')
+			out.write("Total time    = %f  (s)  " % report["total_seconds"] + '\n')
+			out.write("Peak memory   = %f  (MB)  " % report["peak_mb"] + '\n')
+			out.write("#  stage            time (s)    share   peak (MB)" + '\n')
+			for row in report["stages"]:
+				share = 100.0*row["seconds"]/report["total_seconds"] if report["total_seconds"] > 0 else 0.0
+				out.write("   %-16s %-11.6f %5.1f%%  %-10.3f" % (row["stage"],row["seconds"],share,row["peak_mb"]) + '\n')
+			nn = report["neighbors"]
+			if nn is not None:
+				out.write("Search passes = %i    %s" % (nn["passes"],"(cached)" if nn["cached"] else "") + '\n')
+				if nn["unique"] is not None:
+					out.write("Unique atoms  = %i    " % nn["unique"] + '\n')
+				out.write("Pairs         = %i    " % nn["pairs"] + '\n')
+				if nn["pairs_per_second"] is not None:
+					out.write("Pairs/second  = %e    " % nn["pairs_per_second"] + '\n')
+		finally:
+			if parameters.save:
+				out.close()
+
+
+class _Stage:
+	def __init__(self,profiler,name):
+		self.profiler = profiler
+		self.name = name
+
+	def __enter__(self):
+		self.profiler.begin(self.name)
+		return self
+
+	def __exit__(self,*exc):
+		self.profiler.end()
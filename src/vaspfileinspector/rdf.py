@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import sys
+from vaspfileinspector.neighbors import (KERNELS,select_engine)
+
+
+# Radial distribution function, total g(r) and partial g_ab(r).
+# Pair blocks from the neighbor kernels are binned straight into a fixed
+# (species pair, r) histogram, so memory does not grow with the number of
+# atoms or frames. Frames are added with accumulate(), the normalization
+# (N_a (N_b - delta_ab) / V per frame) is summed along with the counts so
+# cells of different volume can be mixed
+class RDF:
+	def __init__(self,rmax=6.0,nbins=120,engine="auto"):
+
+		self.rmax = rmax
+		self.nbins = nbins
+		self.dr = rmax/float(nbins)
+		self.engine = engine
+
+		self.frames = 0
+		self.species = []
+
+		# histogram and normalization per ordered species pair
+		self.counts = np.zeros((0,0,nbins),dtype=np.int64)
+		self.norm = np.zeros((0,0),dtype='double')
+
+	def accumulate(self,atoms):
+
+		x = np.asarray(atoms.x,dtype='double')
+		H = np.asarray(atoms.H,dtype='double')
+
+		codes = self._species_codes( atoms.species,atoms.codes )
+		ntypes = len(self.species)
+		natoms = np.bincount(codes,minlength=ntypes).astype('double')
+
+		volume = atoms.v
+		if not volume:
+			volume = abs(np.linalg.det(H))
+
+		# the cached arrays of the Lattice the atoms were built on
+		cell = getattr(atoms,"lattice",None)
+		if cell is None:
+			cell = H
+
+		hist = np.zeros(ntypes*ntypes*self.nbins,dtype=np.int64)
+		engine = select_engine( x,cell,self.rmax,self.engine )
+		for pi,pj,img,bij in KERNELS[engine]( x,cell,self.rmax ):
+			rbin = np.minimum((bij/self.dr).astype(np.intp),self.nbins-1)
+			key = (codes[pi]*ntypes + codes[pj])*self.nbins + rbin
+			hist += np.bincount(key,minlength=len(hist))
+
+		self.counts += hist.reshape(ntypes,ntypes,self.nbins)
+		self.norm += (np.outer(natoms,natoms) - np.diag(natoms))/volume
+		self.frames += 1
+
+	def get_r(self):
+		return (np.arange(self.nbins) + 0.5)*self.dr
+
+	def get_shell_volumes(self):
+		edges = np.arange(self.nbins + 1)*self.dr
+		return 4.0/3.0*np.pi*(edges[1:]**3 - edges[:-1]**3)
+
+	# total g(r)
+	def get_total(self):
+		norm = self.norm.sum()
+		if norm == 0:
+			return np.zeros(self.nbins)
+		return self.counts.sum(axis=(0,1))/(norm*self.get_shell_volumes())
+
+	# g_ab(r) for a <= b, as {(a,b): g}
+	def get_partials(self):
+		shells = self.get_shell_volumes()
+		partials = {}
+		for a in range(len(self.species)):
+			for b in range(a,len(self.species)):
+				counts = self.counts[a,b] + self.counts[b,a]
+				norm = self.norm[a,b] + self.norm[b,a]
+				if norm > 0:
+					g = counts/(norm*shells)
+				else:
+					g = np.zeros(self.nbins)
+				partials[(self.species[a],self.species[b])] = g
+		return partials
+
+	def show_info(self,parameters):
+
+		if parameters.save:
+			name = parameters.compound + ".rdf"
+			out = open(name,'w')
+		else:
+			out = sys.stdout
+		try:
+			if out is sys.stdout:
+				out.write('\n' + "/*-- RDF --*/" + '\n')
+			else:
+				out.write("/*-- RDF --*/" + '\n')
+			out.write("Structure     = %s    " % parameters.FILE + '\n')
+			out.write("Compound      = %s    " % parameters.compound + '\n')
+			out.write("Frames        = %i    " % self.frames + '\n')
+			out.write("Rmax          = %f  (Å)  " % self.rmax + '\n')
+			out.write("dr            = %f  (Å)  " % self.dr + '\n')
+
+			partials = self.get_partials()
+			out.write("#  r(Å)     g(r)      ")
+			for a,b in partials:
+				out.write(" %-9s" % (a + "-" + b))
+			out.write('\n')
+
+			table = np.column_stack([self.get_r(),self.get_total()] + list(partials.values()))
+			fmt = "%-9f" + " %-9f"*(table.shape[1]-1) + '\n'
+			out.write("".join(fmt % tuple(row) for row in table))
+		finally:
+			if parameters.save:
+				out.close()
+
+	# species of every atom as index into self.species, new species
+	# found in later frames are appended
+	def _species_codes(self,species,codes):
+
+		lookup = dict((s,i) for i,s in enumerate(self.species))
+		for s in species:
+			if not s in lookup:
+				lookup[s] = len(self.species)
+				self.species.append(s)
+
+		ntypes = len(self.species)
+		if self.counts.shape[0] < ntypes:
+			counts = np.zeros((ntypes,ntypes,self.nbins),dtype=np.int64)
+			norm = np.zeros((ntypes,ntypes),dtype='double')
+			n = self.counts.shape[0]
+			counts[:n,:n] = self.counts
+			norm[:n,:n] = self.norm
+			self.counts = counts
+			self.norm = norm
+
+		remap = np.array([lookup[s] for s in species],dtype=np.intp)
+		return remap[codes]
+
+
+def radial_distribution(atoms,rmax=6.0,nbins=120):
+	rdf = RDF(rmax,nbins)
+	rdf.accumulate(atoms)
+	return rdf.get_r(),rdf.get_total(),rdf.get_partials()
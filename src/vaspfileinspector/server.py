@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import json
+import socket
+import struct
+import time
+
+# Warm daemon for scripts that call vfi many times.
+#
+#   vfi serve [--socket=PATH] [--memory=MB] &
+#   vfi --client [--socket=PATH] POSCAR -bc
+#
+# vfi serve imports numpy, spglib and the analysis modules once and keeps the
+# parsed structures, symmetry datasets and neighbor lists of earlier requests
+# in a cache.MemoryCache in front of the disk cache. vfi --client sends its
+# arguments and working directory as one JSON line over a Unix socket, the
+# daemon runs them through cli.main and streams back what the normal CLI
+# would have written to stdout and stderr, then the exit status. Files
+# written with -s or -e land in the client's directory as usual.
+#
+# Requests are served one at a time. Without a daemon listening the client
+# runs the command itself, so scripts work either way.
+#
+#   VFI_SOCKET   socket path (default $XDG_RUNTIME_DIR/vfi.sock or
+#                /tmp/vfi-<uid>.sock)
+#
+# Only the modules above are imported here, the client starts as fast as
+# the interpreter does.
+
+# reply frames, one byte kind and the payload size
+STDOUT = b'o'
+STDERR = b'e'
+EXIT = b'x'
+HEADER = struct.Struct("!cI")
+
+# text is sent in frames of about this many bytes
+FRAME_SIZE = 1<<16
+
+
+def socket_path():
+	path = os.environ.get("VFI_SOCKET")
+	if path:
+		return path
+	runtime = os.environ.get("XDG_RUNTIME_DIR")
+	if runtime:
+		return os.path.join(runtime,"vfi.sock")
+	import tempfile
+	return os.path.join(tempfile.gettempdir(),"vfi-%i.sock" % os.getuid())
+
+
+def send_frame(conn,kind,payload):
+	conn.sendall(HEADER.pack(kind,len(payload)) + payload)
+
+def read_exactly(f,n):
+	data = f.read(n)
+	if len(data) != n:
+		raise ConnectionError("vfi serve closed the connection")
+	return data
+
+def read_frames(f):
+	while True:
+		kind,n = HEADER.unpack(read_exactly(f,HEADER.size))
+		yield kind,read_exactly(f,n)
+		if kind == EXIT:
+			return
+
+
+# text stream of the daemon that sends what is written to the client
+class Channel:
+	def __init__(self,conn,kind):
+		self.conn = conn
+		self.kind = kind
+		self.parts = []
+		self.size = 0
+		self.encoding = "utf-8"
+
+	def write(self,text):
+		self.parts.append(text)
+		self.size += len(text)
+		if self.size >= FRAME_SIZE:
+			self.flush()
+		return len(text)
+
+	def writelines(self,lines):
+		for line in lines:
+			self.write(line)
+
+	def flush(self):
+		if self.parts:
+			payload = "".join(self.parts).encode(self.encoding,"surrogateescape")
+			self.parts = []
+			self.size = 0
+			send_frame(self.conn,self.kind,payload)
+
+	def writable(self):
+		return True
+
+	def isatty(self):
+		return False
+
+
+class Server:
+	def __init__(self,path=None,cache=None,verbose=False):
+
+		from vaspfileinspector.cache import MemoryCache
+
+		self.path = path if path is not None else socket_path()
+		self.cache = cache if cache is not None else MemoryCache()
+		self.verbose = verbose
+		self.requests = 0
+		self.sock = None
+
+	# imports every request would otherwise pay for
+	def warm(self):
+		import numpy
+		import spglib
+		from vaspfileinspector import (cli,pipeline,reader,trajectory,writer,lattice,atoms,
+		                               neighbors,symmetry,topology,rdf,profiling)
+
+	def bind(self):
+		if os.path.exists(self.path):
+			probe = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+			try:
+				probe.connect(self.path)
+			except OSError:
+				# left behind by a daemon that did not shut down
+				os.remove(self.path)
+			else:
+				raise RuntimeError("a daemon is already listening on %s" % self.path)
+			finally:
+				probe.close()
+		self.sock = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+		umask = os.umask(0o177)
+		try:
+			self.sock.bind(self.path)
+		finally:
+			os.umask(umask)
+		self.sock.listen(64)
+
+	def serve_forever(self):
+		if self.sock is None:
+			self.bind()
+		try:
+			while True:
+				conn,address = self.sock.accept()
+				with conn:
+					try:
+						self.handle(conn)
+					except (OSError,ValueError,KeyError,TypeError,AttributeError) as e:
+						# client gone or not speaking the protocol
+						self.log("dropped request: %s" % e)
+		finally:
+			self.close()
+
+	def close(self):
+		if self.sock is not None:
+			self.sock.close()
+			self.sock = None
+			try:
+				os.remove(self.path)
+			except OSError:
+				pass
+
+	def handle(self,conn):
+		with conn.makefile('rb') as f:
+			line = f.readline()
+		try:
+			argv,cwd,prog = parse_request(line)
+		except ValueError as e:
+			self.log("rejected request: %s" % e)
+			send_frame(conn,STDERR,("vfi serve: %s\n" % e).encode("utf-8"))
+			send_frame(conn,EXIT,json.dumps({"status":2}).encode())
+			return
+		t0 = time.perf_counter()
+		status = self.run(argv,cwd,prog,conn)
+		self.requests += 1
+		self.log("%-6i %8.1f ms  status %i  %s" % (self.requests,1e3*(time.perf_counter() - t0),status," ".join(argv)))
+		send_frame(conn,EXIT,json.dumps({"status":status}).encode())
+
+	# cli.main on argv as if run in cwd, returns the exit status
+	def run(self,argv,cwd,prog,conn):
+		import tracemalloc
+		from vaspfileinspector import cli
+		out = Channel(conn,STDOUT)
+		err = Channel(conn,STDERR)
+		saved = (os.getcwd(),sys.argv,sys.stdout,sys.stderr)
+		tracing = tracemalloc.is_tracing()
+		status = 0
+		try:
+			os.chdir(cwd)
+			sys.argv = [prog] + argv
+			sys.stdout,sys.stderr = out,err
+			cli.main(argv,cache=self.cache)
+		except SystemExit as e:
+			status = exit_status(e.code)
+		except Exception:
+			import traceback
+			traceback.print_exc()
+			status = 1
+		finally:
+			os.chdir(saved[0])
+			sys.argv,sys.stdout,sys.stderr = saved[1:]
+			# --profile starts tracing, later requests should not pay for it
+			if not tracing and tracemalloc.is_tracing():
+				tracemalloc.stop()
+		out.flush()
+		err.flush()
+		return status
+
+	def log(self,message):
+		if self.verbose:
+			sys.stderr.write("vfi serve: %s\n" % message)
+			sys.stderr.flush()
+
+
+# (argv, cwd, prog) of one JSON request line, ValueError unless it is an
+# object with a list of strings "argv" and a string "cwd"
+def parse_request(line):
+	try:
+		request = json.loads(line.decode("utf-8"))
+	except ValueError:
+		raise ValueError("request is not a JSON line")
+	if not isinstance(request,dict):
+		raise ValueError("request is not a JSON object")
+	argv = request.get("argv")
+	if not isinstance(argv,list) or not all(isinstance(a,str) for a in argv):
+		raise ValueError("request has no list of strings \"argv\"")
+	cwd = request.get("cwd")
+	if not isinstance(cwd,str) or not cwd:
+		raise ValueError("request has no string \"cwd\"")
+	prog = request.get("prog")
+	if not isinstance(prog,str) or not prog:
+		prog = "vfi"
+	return argv,cwd,prog
+
+
+# status of sys.exit(code), a message goes to stderr like the interpreter does
+def exit_status(code):
+	if code is None:
+		return 0
+	if isinstance(code,int):
+		return code
+	sys.stderr.write("%s\n" % code)
+	return 1
+
+
+# vfi --client ...: send the rest of argv to the daemon
+def client(argv):
+	path = None
+	rest = []
+	args = iter(argv)
+	for a in args:
+		if a == "--client":
+			continue
+		if a == "--socket" or a == "--socket=":
+			path = next(args,None)
+		elif a.startswith("--socket="):
+			path = a[len("--socket="):]
+		else:
+			rest.append(a)
+	if not path:
+		path = socket_path()
+
+	conn = socket.socket(socket.AF_UNIX,socket.SOCK_STREAM)
+	try:
+		conn.connect(path)
+	except OSError:
+		# nobody listening, do it here
+		conn.close()
+		from vaspfileinspector import cli
+		return cli.main(rest)
+
+	request = {"argv":rest,"cwd":os.getcwd(),"prog":os.path.basename(sys.argv[0])}
+	status = 1
+	with conn:
+		conn.sendall(json.dumps(request).encode("utf-8") + b'\n')
+		with conn.makefile('rb') as f:
+			for kind,payload in read_frames(f):
+				if kind == STDOUT:
+					sys.stdout.flush()
+					sys.stdout.buffer.write(payload)
+				elif kind == STDERR:
+					sys.stderr.flush()
+					sys.stderr.buffer.write(payload)
+				elif kind == EXIT:
+					status = json.loads(payload.decode())["status"]
+	sys.stdout.flush()
+	sys.stderr.flush()
+	sys.exit(status)
+
+
+def get_arguments(argv):
+
+	import argparse
+	cli = argparse.ArgumentParser(prog="vfi serve",
+	      description="keep vfi loaded and answer vfi --client requests over a Unix socket")
+	cli.add_argument("--socket=", dest="socket",help="socket path, (default = %s)" % socket_path(),default=None,type=str)
+	cli.add_argument("--memory=", dest="memory",help="MB of parsed structures, symmetry datasets and neighbor lists kept in memory,(default = %(default)s)",default=512,type=float)
+	cli.add_argument("--no-cache", dest="cache",help="keep results in memory only, do not read or write the cache directory",action="store_false")
+	cli.add_argument("-v", dest="verb",help="log every request with its time on stderr",action="store_true")
+	return cli.parse_args(argv)
+
+
+# vfi serve ...
+def main(argv=None):
+
+	if argv is None:
+		argv = sys.argv[1:]
+	parameters = get_arguments(argv)
+
+	import signal
+	from vaspfileinspector.cache import MemoryCache
+
+	cache = MemoryCache(memory=parameters.memory*1024*1024,disk=parameters.cache)
+	server = Server(parameters.socket,cache,verbose=parameters.verb)
+	server.warm()
+
+	# kill and Ctrl-C remove the socket on the way out
+	signal.signal(signal.SIGTERM,lambda signum,frame: sys.exit(0))
+	try:
+		server.bind()
+	except RuntimeError as e:
+		sys.exit("vfi serve: %s" % e)
+	server.log("listening on %s" % server.path)
+	try:
+		server.serve_forever()
+	except KeyboardInterrupt:
+		pass
+	finally:
+		server.close()
+
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+
+import sys
+from vaspfileinspector.lattice import (dataset_field,bravais_lattice)
+
+# Space group as a function of the symmetry tolerance.
+# Every symprec of the sweep is looked up in the cache first, the remaining
+# ones are handed to spglib, spread over worker processes when the cell is
+# large enough for a process start to pay off. New datasets go back into the
+# cache so a repeated sweep (or a later -t run at one of its tolerances)
+# does not call spglib at all
+
+SWEEP_TOLERANCES = (1e-5,1e-4,1e-3,1e-2,0.05,0.1,0.2)
+
+# atoms below which spglib is faster than starting a pool
+SWEEP_PARALLEL_ATOMS = 2000
+
+
+def parse_tolerances(text):
+	return sorted(set(float(t) for t in text.replace(","," ").split()))
+
+
+def _dataset(args):
+	import spglib
+	cell,symprec = args
+	return spglib.get_symmetry_dataset(cell,symprec)
+
+
+class SymmetrySweep:
+	def __init__(self,tolerances=SWEEP_TOLERANCES):
+
+		self.tolerances = list(tolerances)
+		self.datasets = []
+
+		# tolerances answered from the cache, and by spglib
+		self.cached = 0
+		self.computed = 0
+
+	def run(self,cell,cache=None,filename=None,frame=None,jobs=1):
+
+		from vaspfileinspector.cache import (pack_dataset,unpack_dataset)
+
+		use_cache = cache is not None and cache.enabled and filename is not None
+		datasets = [None]*len(self.tolerances)
+		todo = []
+		for k,symprec in enumerate(self.tolerances):
+			if use_cache:
+				arrays = cache.load(cache.symmetry_key(filename,frame,symprec))
+				if arrays is not None:
+					try:
+						datasets[k] = unpack_dataset(arrays)
+						self.cached += 1
+						continue
+					except (KeyError,ValueError,TypeError):
+						pass
+			todo.append(k)
+
+		tasks = [(cell,self.tolerances[k]) for k in todo]
+		if jobs > 1 and len(tasks) > 1 and len(cell[1]) >= SWEEP_PARALLEL_ATOMS:
+			import multiprocessing as mp
+			with mp.Pool(min(jobs,len(tasks))) as pool:
+				results = pool.map(_dataset,tasks)
+		else:
+			results = [_dataset(t) for t in tasks]
+
+		for k,dataset in zip(todo,results):
+			datasets[k] = dataset
+			self.computed += 1
+			if use_cache and dataset is not None:
+				cache.save(cache.symmetry_key(filename,frame,self.tolerances[k]),pack_dataset(dataset))
+
+		self.datasets = datasets
+		return datasets
+
+	# (symprec, number, international, bravais, operations) per tolerance,
+	# None fields where spglib found no symmetry
+	def get_table(self):
+		rows = []
+		for symprec,dataset in zip(self.tolerances,self.datasets):
+			if dataset is None:
+				rows.append((symprec,None,None,None,None))
+				continue
+			number = int(dataset_field(dataset,'number'))
+			rows.append((symprec,number,dataset_field(dataset,'international'),
+			             bravais_lattice(number),len(dataset_field(dataset,'rotations'))))
+		return rows
+
+	def show_info(self,parameters):
+
+		if parameters.save:
+			name = parameters.compound + ".symmetry"
+			out = open(name,'w')
+		else:
+			out = sys.stdout
+		try:
+			if out is sys.stdout:
+				out.write('\n' + "/*-- Symmetry --*/" + '\n')
+			else:
+				out.write("/*-- Symmetry --*/" + '\n')
+			out.write("Structure     = %s    " % parameters.FILE + '\n')
+			out.write("Compound      = %s    " % parameters.compound + '\n')
+			out.write("Tolerances    = %i  (%i cached)  " % (len(self.tolerances),self.cached) + '\n')
+			out.write("#  symprec   number  symbol      bravais        operations" + '\n')
+			for symprec,number,symbol,bravais,nops in self.get_table():
+				if number is None:
+					out.write("   %-9.0e %-7s %-11s %-14s %s" % (symprec,"-","-","-","-") + '\n')
+				else:
+					out.write("   %-9.0e %-7i %-11s %-14s %i" % (symprec,number,symbol,bravais,nops) + '\n')
+		finally:
+			if parameters.save:
+				out.close()
+
+
+def symmetry_sweep(cell,tolerances=SWEEP_TOLERANCES,jobs=1):
+	sweep = SymmetrySweep(tolerances)
+	sweep.run(cell,jobs=jobs)
+	return sweep.get_table()
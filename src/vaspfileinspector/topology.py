@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+
+import numpy as np
+import sys
+
+
+# Bond topology from a finished neighbor list.
+# Coordination numbers are the row lengths of the CSR list. Bond angles are
+# taken over every pair of neighbors (j, k) of each center atom i, the
+# triplets are generated with array operations on the CSR arrays and binned
+# per species triplet j-i-k (j <= k) into 1 degree bins
+class Topology:
+	def __init__(self,nbins=180,block=1<<20):
+
+		self.nbins = nbins
+		self.block = block
+
+		self.species = []
+		self.cn = None
+		# cn_hist[s][n] -> atoms of species s with n neighbors
+		self.cn_hist = None
+		# angle_hist[a,c,b] -> angle histogram of a-c-b, a <= b
+		self.angle_hist = None
+
+	def analyze(self,nn,atoms):
+
+		indexer,neighborList = nn.get_nn_list()
+		images = nn.get_image_list()
+
+		x = np.asarray(atoms.x,dtype='double')
+		H = np.asarray(atoms.H,dtype='double')
+
+		self.species = list(atoms.species)
+		codes = np.asarray(atoms.codes,dtype=np.intp)
+		ntypes = len(self.species)
+
+		# coordination numbers
+		self.cn = np.diff(indexer)
+		maxcn = int(self.cn.max()) if len(self.cn) else 0
+		self.cn_hist = np.zeros((ntypes,maxcn+1),dtype=np.int64)
+		np.add.at(self.cn_hist,(codes,self.cn),1)
+
+		# bond vectors of every list entry
+		center = np.repeat(np.arange(len(x)),self.cn)
+		bonds = x[neighborList] + np.dot(images,H) - x[center]
+		lengths = np.sqrt(np.einsum('ij,ij->i',bonds,bonds))
+
+		# every entry p pairs with the later entries of the same row
+		after = indexer[center+1] - np.arange(len(center)) - 1
+		ends = np.cumsum(after)
+
+		hist = np.zeros(ntypes*ntypes*ntypes*self.nbins,dtype=np.int64)
+		p0 = 0
+		while p0 < len(after):
+			base = ends[p0-1] if p0 > 0 else 0
+			p1 = int(np.searchsorted(ends,base+self.block,side='right'))
+			p1 = max(p1,p0+1)
+
+			n = after[p0:p1]
+			first = np.repeat(np.arange(p0,p1),n)
+			second = first + 1 + np.arange(ends[p1-1]-base) - np.repeat(ends[p0:p1]-n-base,n)
+			p0 = p1
+			if len(first) == 0:
+				continue
+
+			c = np.einsum('ij,ij->i',bonds[first],bonds[second])/(lengths[first]*lengths[second])
+			angle = np.degrees(np.arccos(np.clip(c,-1.0,1.0)))
+			abin = np.minimum((angle*self.nbins/180.0).astype(np.intp),self.nbins-1)
+
+			a = codes[neighborList[first]]
+			b = codes[neighborList[second]]
+			key = ((np.minimum(a,b)*ntypes + codes[center[first]])*ntypes + np.maximum(a,b))*self.nbins + abin
+			hist += np.bincount(key,minlength=len(hist))
+
+		self.angle_hist = hist.reshape(ntypes,ntypes,ntypes,self.nbins)
+
+	def get_angles(self):
+		return (np.arange(self.nbins) + 0.5)*180.0/self.nbins
+
+	# angle histograms for the triplets that occur, as {(a,c,b): counts}
+	def get_angle_distributions(self):
+		dist = {}
+		nt = len(self.species)
+		for a in range(nt):
+			for c in range(nt):
+				for b in range(a,nt):
+					h = self.angle_hist[a,c,b]
+					if h.any():
+						dist[(self.species[a],self.species[c],self.species[b])] = h
+		return dist
+
+	def show_info(self,parameters):
+
+		if parameters.save:
+			name = parameters.compound + ".topology"
+			out = open(name,'w')
+		else:
+			out = sys.stdout
+		try:
+			if out is sys.stdout:
+				out.write('\n' + "/*-- Topology --*/" + '\n')
+			else:
+				out.write("/*-- Topology --*/" + '\n')
+			out.write("Structure     = %s    " % parameters.FILE + '\n')
+			out.write("Compound      = %s    " % parameters.compound + '\n')
+
+			out.write("Mean CN       =")
+			for s in range(len(self.species)):
+				n = self.cn_hist[s].sum()
+				mean = np.dot(np.arange(self.cn_hist.shape[1]),self.cn_hist[s])/n if n else 0
+				out.write(" %s %f" % (self.species[s],mean))
+			out.write('\n')
+
+			out.write("#  CN ")
+			for s in self.species:
+				out.write(" %-8s" % s)
+			out.write('\n')
+			for n in range(self.cn_hist.shape[1]):
+				out.write("%5i " % n)
+				for s in range(len(self.species)):
+					out.write(" %-8i" % self.cn_hist[s][n])
+				out.write('\n')
+
+			dist = self.get_angle_distributions()
+			out.write("#  angle(°)")
+			for a,c,b in dist:
+				out.write(" %-10s" % (a + "-" + c + "-" + b))
+			out.write('\n')
+			if dist:
+				table = np.column_stack([self.get_angles()] + list(dist.values()))
+				fmt = "%-10f" + " %-10i"*len(dist) + '\n'
+				out.write("".join(fmt % tuple(row) for row in table))
+		finally:
+			if parameters.save:
+				out.close()
+
+
+def bond_topology(nn,atoms,nbins=180):
+	topo = Topology(nbins)
+	topo.analyze(nn,atoms)
+	return topo
@@ -0,0 +1,213 @@
+import io
+import mmap
+import re
+import numpy as np
+from vaspfileinspector import reader
+
+# XDATCAR trajectories.
+#
+# The file is memory mapped and a single regular expression scan records the
+# byte offset of every "Direct configuration=" line. A frame is only parsed
+# when it is asked for, from its own slice of the map, so frames can be
+# streamed or picked at random with memory independent of the file size.
+# Variable cell files (a full header before every configuration) are
+# detected from the line preceding the second configuration.
+#
+# Compressed files (gzip, bz2, xz) cannot be mapped. They are scanned once
+# through the decompressor in fixed size chunks and frames are then read by
+# seeking in the decompressed stream: iterating is a single forward pass,
+# picking a frame behind the current position restarts the decompression.
+# Memory stays at one frame either way.
+#
+# Frames come out as the tuple reader.read_vasp returns:
+#   (lattice, positions, species, num_atoms, numbers)
+
+_configuration = re.compile(rb'^[ \t]*([A-Za-z]*)[ \t]+configuration=', re.M)
+
+
+def is_xdatcar(filename):
+    with reader.open_binary(filename) as f:
+        head = f.read(4096)
+    return _configuration.search(head) is not None
+
+
+# configuration lines of a stream, read in chunks cut at line ends
+def _scan(f, chunk=1 << 20):
+    offsets = []
+    cartesian = []
+    base = 0
+    rest = b''
+    while True:
+        block = f.read(chunk)
+        data = rest + block
+        cut = data.rfind(b'\n') + 1 if block else len(data)
+        for m in _configuration.finditer(data, 0, cut):
+            offsets.append(base + m.start())
+            cartesian.append(m.group(1)[:1].lower() in (b'c', b'k'))
+        base += cut
+        rest = data[cut:]
+        if not block:
+            return offsets, cartesian, base
+
+
+# the slicing and rfind interface of the mmap over a decompressing stream.
+# The last block read is kept, the header lines of a frame sit at the end of
+# the previous frame and are found there without seeking back
+class _Stream:
+    def __init__(self, f, size):
+        self._f = f
+        self._size = size
+        self._base = 0
+        self._buf = b''
+
+    def __len__(self):
+        return self._size
+
+    def __getitem__(self, s):
+        start = 0 if s.start is None else int(s.start)
+        stop = self._size if s.stop is None else min(int(s.stop), self._size)
+        if start >= self._base and stop <= self._base + len(self._buf):
+            return self._buf[start - self._base:stop - self._base]
+        self._f.seek(start)
+        self._buf = self._f.read(stop - start)
+        self._base = start
+        return self._buf
+
+    def rfind(self, sub, lo, hi, window=4096):
+        if self._base <= hi <= self._base + len(self._buf):
+            i = self._buf.rfind(sub, max(lo - self._base, 0), hi - self._base)
+            if i >= 0:
+                return self._base + i
+        while True:
+            start = max(hi - window, lo)
+            i = self[start:hi].rfind(sub)
+            if i >= 0:
+                return start + i
+            if start == lo:
+                return -1
+            window *= 2
+
+    def close(self):
+        self._f.close()
+
+
+class Trajectory:
+    def __init__(self, filename):
+
+        self.filename = filename
+        self.compression = reader.compression(filename)
+
+        # offsets of the configuration lines and whether they are cartesian
+        if self.compression is None:
+            self._file = open(filename, 'rb')
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            offsets = []
+            cartesian = []
+            for m in _configuration.finditer(self._map):
+                offsets.append(m.start())
+                cartesian.append(m.group(1)[:1].lower() in (b'c', b'k'))
+        else:
+            self._file = reader.open_binary(filename)
+            offsets, cartesian, size = _scan(self._file)
+            self._map = _Stream(self._file, size)
+        self.offsets = np.array(offsets, dtype=np.int64)
+        self.cartesian = np.array(cartesian, dtype=bool)
+        if len(offsets) == 0:
+            self.close()
+            raise ValueError("%s: no configurations found" % filename)
+
+        # the header in front of the first configuration
+        header = self._map[:self.offsets[0]].decode().splitlines()
+        self._header_lines = len(header)
+        (self.lattice, self.symbols, self.num_atoms) = self._parse_header(header)
+        self.natoms = int(self.num_atoms.sum())
+
+        self.numbers = reader._expand_symbols(self.num_atoms, self.symbols)
+        self.species = reader.atomic_number_symbols(self.numbers)
+
+        # a variable cell file repeats the atom counts right before
+        # every configuration line after the first
+        self.variable_cell = False
+        if len(self.offsets) > 1:
+            before = self._lines_before(self.offsets[1], 1)
+            self.variable_cell = before[-1].split() == header[-1].split()
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, k):
+        if k < 0:
+            k += len(self)
+        if k < 0 or k >= len(self):
+            raise IndexError("frame %i out of range, %i frames" % (k, len(self)))
+        return self.read_frame(k)
+
+    def __iter__(self):
+        for k in range(len(self)):
+            yield self.read_frame(k)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self._map.close()
+        self._file.close()
+
+    def read_frame(self, k):
+
+        lattice = self.lattice
+        if self.variable_cell and k > 0:
+            lattice = self._parse_header(self._lines_before(self.offsets[k], self._header_lines))[0]
+
+        if k + 1 < len(self):
+            end = self.offsets[k + 1]
+        else:
+            end = len(self._map)
+
+        # one forward read from the configuration line, a compressed stream
+        # never has to seek back
+        block = self._map[self.offsets[k]:end]
+        start = block.find(b'\n') + 1
+
+        positions = np.loadtxt(io.BytesIO(block[start:]), usecols=(0, 1, 2),
+                               max_rows=self.natoms, ndmin=2, dtype='double')
+
+        if not self.cartesian[k]:
+            positions = np.dot(positions, lattice)
+
+        return (lattice, positions, self.species, self.num_atoms, self.numbers)
+
+    # the n lines in front of the line starting at offset
+    def _lines_before(self, offset, n):
+        start = offset - 1
+        for i in range(n):
+            start = self._map.rfind(b'\n', 0, start)
+        return self._map[start + 1:offset].decode().splitlines()
+
+    # comment, scale, three lattice vectors, [symbols], counts
+    def _parse_header(self, lines):
+        line1 = lines[0].split()
+        if reader._is_exist_symbols(line1):
+            symbols = line1
+        else:
+            symbols = None
+
+        scale = float(lines[1])
+        lattice = np.array([[float(x) for x in lines[i].split()[:3]] for i in range(2, 5)]) * scale
+
+        try:
+            num_atoms = np.array([int(x) for x in lines[5].split()])
+        except ValueError:
+            symbols = lines[5].split()
+            num_atoms = np.array([int(x) for x in lines[6].split()])
+
+        return lattice, symbols, num_atoms
+
+
+def iread_xdatcar(filename):
+    with Trajectory(filename) as traj:
+        for frame in traj:
+            yield frame
@@ -0,0 +1,176 @@
+import numpy as np
+
+# Structure files and binary exports.
+#
+# Coordinate blocks are formatted a chunk of rows at a time: one format
+# string repeated for every row of the chunk is applied to the flat list of
+# values, so Python never loops over atoms. Chunks keep the text in memory
+# bounded for very large cells.
+#
+# export() writes the structure and whatever analysis has been done (CSR
+# neighbor list, bond list, g(r), topology) into one .npz or, when h5py is
+# installed, HDF5 file. Arrays are stored under "<section>/<name>" keys,
+# read_export() gives them back as a flat dict.
+
+PRECISION = 6
+
+CHUNK_ROWS = 1 << 16
+
+
+# text of the rows of a 2d array, in chunks of CHUNK_ROWS rows
+def format_rows(values, fmt, chunk=CHUNK_ROWS):
+    values = np.asarray(values)
+    if values.ndim == 1:
+        values = values[:, None]
+    line = " ".join([fmt] * values.shape[1]) + '\n'
+    for i in range(0, len(values), chunk):
+        block = values[i:i + chunk]
+        yield (line * len(block)) % tuple(block.ravel().tolist())
+
+
+# species and counts of the consecutive runs of equal symbols, the order
+# atoms are written in
+def species_runs(symbols):
+    species = []
+    counts = []
+    for s in symbols:
+        if species and species[-1] == s:
+            counts[-1] += 1
+        else:
+            species.append(s)
+            counts.append(1)
+    return species, counts
+
+
+def write_poscar(filename, lattice, positions, symbols, comment="",
+                 fractional=True, precision=PRECISION):
+
+    fmt = "%%.%if" % precision
+    species, counts = species_runs(symbols)
+
+    with open(filename, 'w') as out:
+        out.write(comment + '\n')
+        out.write("1.00000" + '\n')
+        for rows in format_rows(lattice, fmt):
+            out.write(rows)
+        out.write("".join("%s " % s for s in species) + '\n')
+        out.write("".join("%i " % n for n in counts) + '\n')
+        out.write(("Direct" if fractional else "Cartesian") + '\n')
+        for rows in format_rows(positions, fmt):
+            out.write(rows)
+
+
+# the analysis results as a flat dict of arrays
+def export_arrays(atoms=None, nn=None, rdf=None, topo=None):
+
+    arrays = {}
+
+    if atoms is not None:
+        arrays["structure/lattice"] = np.asarray(atoms.H, dtype='double')
+        arrays["structure/positions"] = np.asarray(atoms.x, dtype='double')
+        arrays["structure/fractional"] = np.asarray(atoms.xs, dtype='double')
+        arrays["structure/numbers"] = np.asarray(atoms.numbers)
+        arrays["structure/symbols"] = np.asarray(atoms.symbols, dtype=str)
+
+    if nn is not None:
+        arrays["neighbors/indicies"] = nn.indicies
+        arrays["neighbors/neighbors"] = nn.neighbors
+        arrays["neighbors/bonds"] = nn.bonds
+        arrays["neighbors/images"] = nn.images
+        arrays["neighbors/rcut"] = np.asarray(nn.rcut, dtype='double')
+        arrays["neighbors/nbonds"] = np.asarray(nn.nbonds)
+
+        # every bond once: i < j, or the image pointing up for an atom
+        # bonded to its own periodic copy
+        pi = np.repeat(np.arange(len(nn.indicies) - 1), np.diff(nn.indicies))
+        pj = nn.neighbors
+        img = nn.images
+        first = np.argmax(img != 0, axis=1)
+        up = img[np.arange(len(img)), first] > 0
+        keep = (pi < pj) | ((pi == pj) & up)
+        arrays["bonds/i"] = pi[keep].astype(np.int32)
+        arrays["bonds/j"] = pj[keep]
+        arrays["bonds/image"] = img[keep]
+        arrays["bonds/length"] = nn.bonds[keep]
+
+    if rdf is not None:
+        partials = rdf.get_partials()
+        arrays["rdf/r"] = rdf.get_r()
+        arrays["rdf/g"] = rdf.get_total()
+        arrays["rdf/pairs"] = np.asarray(list(partials), dtype=str).reshape(-1, 2)
+        arrays["rdf/partials"] = np.asarray(list(partials.values())).reshape(-1, rdf.nbins)
+        arrays["rdf/counts"] = rdf.counts
+        arrays["rdf/species"] = np.asarray(rdf.species, dtype=str)
+        arrays["rdf/frames"] = np.asarray(rdf.frames)
+
+    if topo is not None:
+        arrays["topology/species"] = np.asarray(topo.species, dtype=str)
+        arrays["topology/cn"] = topo.cn
+        arrays["topology/cn_hist"] = topo.cn_hist
+        arrays["topology/angles"] = topo.get_angles()
+        arrays["topology/angle_hist"] = topo.angle_hist
+
+    return arrays
+
+
+def is_hdf5(filename):
+    return filename.lower().endswith((".h5", ".hdf5", ".hdf"))
+
+
+def export(filename, atoms=None, nn=None, rdf=None, topo=None):
+
+    arrays = export_arrays(atoms, nn, rdf, topo)
+
+    if is_hdf5(filename):
+        _write_hdf5(filename, arrays)
+    else:
+        np.savez_compressed(filename, **arrays)
+
+
+def read_export(filename):
+
+    if is_hdf5(filename):
+        return _read_hdf5(filename)
+
+    with np.load(filename, allow_pickle=False) as z:
+        return dict((k, z[k]) for k in z.files)
+
+
+def _h5py():
+    try:
+        import h5py
+    except ImportError:
+        raise ImportError("HDF5 export needs h5py, install it or use a .npz file")
+    return h5py
+
+
+def _write_hdf5(filename, arrays):
+    h5py = _h5py()
+    with h5py.File(filename, 'w') as f:
+        for key, value in arrays.items():
+            value = np.asarray(value)
+            # HDF5 has no fixed width unicode, store utf-8 bytes
+            if value.dtype.kind == 'U':
+                value = np.char.encode(value, 'utf-8')
+            if value.ndim > 0 and value.size > 0:
+                f.create_dataset(key, data=value, compression="gzip")
+            else:
+                f.create_dataset(key, data=value)
+
+
+def _read_hdf5(filename):
+    h5py = _h5py()
+    arrays = {}
+
+    def visit(name, node):
+        if isinstance(node, h5py.Dataset):
+            value = node[()]
+            if isinstance(value, bytes):
+                value = np.asarray(value.decode('utf-8'))
+            elif getattr(value, "dtype", None) is not None and value.dtype.kind == 'S':
+                value = np.char.decode(value, 'utf-8')
+            arrays[name] = np.asarray(value)
+
+    with h5py.File(filename, 'r') as f:
+        f.visititems(visit)
+    return arrays
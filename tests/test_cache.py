@@ -0,0 +1,42 @@
+# -*- coding: utf-8 -*-
+
+# Disk cache entries survive a cache they cannot touch and failed writes
+# leave nothing behind.
+
+import os
+
+import numpy as np
+
+from vaspfileinspector.cache import Cache
+
+
+def test_hit_without_utime(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path))
+    cache.save("k", {"a": np.arange(3)})
+
+    def denied(*args, **kwargs):
+        raise PermissionError("read only")
+
+    monkeypatch.setattr(os, "utime", denied)
+    arrays = cache.load("k")
+    assert np.array_equal(arrays["a"], np.arange(3))
+    assert os.path.exists(cache.entry("k"))
+
+
+def test_failed_save_removes_temporary(tmp_path, monkeypatch):
+    cache = Cache(str(tmp_path))
+
+    def full(*args, **kwargs):
+        raise OSError(28, "No space left on device")
+
+    monkeypatch.setattr(np, "savez", full)
+    cache.save("k", {"a": np.arange(3)})
+    assert os.listdir(tmp_path) == []
+
+
+def test_clear_removes_temporaries(tmp_path):
+    cache = Cache(str(tmp_path))
+    cache.save("k", {"a": np.arange(3)})
+    (tmp_path / "stale.tmp").write_bytes(b"half")
+    assert cache.clear() == 1
+    assert os.listdir(tmp_path) == []
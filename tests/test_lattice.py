@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+
+# Arrays cached by Lattice.set_cell.
+
+import numpy as np
+
+from vaspfileinspector.lattice import Lattice
+
+H = np.array([[4.0, 0.0, 0.0], [1.2, 3.5, 0.0], [-0.7, 0.9, 5.1]])
+
+
+def test_cached_arrays():
+    lattice = Lattice(H)
+    assert np.allclose(np.dot(lattice.H, lattice.reciprocal.T), np.eye(3))
+    assert np.allclose(lattice.to_fractional(np.dot([0.25, 0.5, 0.75], H)), [0.25, 0.5, 0.75])
+    assert np.isclose(lattice.volume, abs(np.linalg.det(H)))
+    assert lattice.set_volume() == lattice.get_volume() == lattice.volume
+    # height of face i is the volume over the area spanned by the other two
+    for i in range(3):
+        j, k = [a for a in range(3) if a != i]
+        assert np.isclose(lattice.heights[i], lattice.volume / np.linalg.norm(np.cross(H[j], H[k])))
+
+
+def test_scale_refreshes_arrays():
+    lattice = Lattice(H)
+    lattice.scale(2.0)
+    assert np.allclose(lattice.reciprocal, np.linalg.inv(2.0 * H).T)
+    assert np.isclose(lattice.volume, 8.0 * abs(np.linalg.det(H)))
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+
+# Every search engine against a brute force periodic search that visits all
+# lattice images within reach of rcut and keeps the pairs 0 < d <= rcut.
+
+import numpy as np
+import pytest
+
+from vaspfileinspector import neighbors
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors, KERNELS, select_engine
+
+ENGINES = ["direct", "cells", "auto"]
+
+
+def brute_force(x, H, rcut):
+    x = np.asarray(x, dtype='double')
+    H = np.asarray(H, dtype='double')
+    inverse = np.linalg.inv(H)
+    xs = np.dot(x, inverse)
+    heights = 1.0 / np.linalg.norm(inverse, axis=0)
+    span = xs.max(axis=0) - xs.min(axis=0)
+    reach = np.ceil(rcut / heights + span).astype(int) + 1
+
+    natoms = len(x)
+    pi, pj = [a.ravel() for a in np.meshgrid(np.arange(natoms), np.arange(natoms), indexing='ij')]
+    found = []
+    for tz in range(-reach[2], reach[2] + 1):
+        for ty in range(-reach[1], reach[1] + 1):
+            for tx in range(-reach[0], reach[0] + 1):
+                img = np.repeat([[tx, ty, tz]], len(pi), axis=0)
+                shift = img[:, 0:1] * H[0] + img[:, 1:2] * H[1] + img[:, 2:3] * H[2]
+                dr = x[pi] - (x[pj] + shift)
+                bij = np.sqrt(dr[:, 0] * dr[:, 0] + dr[:, 1] * dr[:, 1] + dr[:, 2] * dr[:, 2])
+                keep = (bij != 0) & (bij <= rcut)
+                found.append((pi[keep], pj[keep], img[keep], bij[keep]))
+
+    pi, pj, img, bij = [np.concatenate(c) for c in zip(*found)]
+    order = np.lexsort((pj, img[:, 0], img[:, 1], img[:, 2], pi))
+    indicies = np.zeros(natoms + 1, dtype=np.int32)
+    np.cumsum(np.bincount(pi, minlength=natoms), out=indicies[1:])
+    return indicies, pj[order], bij[order], img[order]
+
+
+def assert_same(nn, reference):
+    indicies, neighbors_, bonds, images = reference
+    assert np.array_equal(nn.indicies, indicies)
+    assert np.array_equal(nn.neighbors, neighbors_)
+    assert np.array_equal(nn.bonds, bonds)
+    assert np.array_equal(nn.images, images)
+
+
+def search(x, H, rcut, engine):
+    nn = Neighbors(rcut, engine=engine)
+    nn.find(x, Lattice(H), ["Si"] * len(x), rcut)
+    return nn
+
+
+def random_cell(seed, natoms, lengths, shear=0.3):
+    rng = np.random.default_rng(seed)
+    H = np.diag(lengths) + shear * rng.uniform(-1.0, 1.0, (3, 3)) * np.array(lengths)[:, None]
+    xs = rng.random((natoms, 3))
+    return H, np.dot(xs, H)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("seed", range(4))
+def test_sheared_cells(engine, seed):
+    H, x = random_cell(seed, 40, (7.0, 8.0, 9.0))
+    assert_same(search(x, H, 3.0, engine), brute_force(x, H, 3.0))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("lengths", [(2.0, 8.0, 8.0), (2.5, 2.5, 9.0), (1.8, 2.2, 2.6)])
+def test_thin_cells(engine, lengths):
+    H, x = random_cell(7, 12, lengths)
+    rcut = 3.0
+    assert 2 * rcut > Lattice(H).heights.min()
+    assert_same(search(x, H, rcut, engine), brute_force(x, H, rcut))
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_unwrapped_coordinates(engine):
+    H, x = random_cell(3, 30, (6.0, 7.0, 8.0))
+    rng = np.random.default_rng(11)
+    x = x + np.dot(rng.integers(-2, 3, (len(x), 3)), H)
+    assert_same(search(x, H, 3.2, engine), brute_force(x, H, 3.2))
+
+
+@pytest.mark.parametrize("natoms", [neighbors.DIRECT_MAX_ATOMS, neighbors.DIRECT_MAX_ATOMS + 1])
+def test_engine_switch(natoms):
+    a = (natoms / 0.05) ** (1.0 / 3.0)
+    H, x = random_cell(5, natoms, (a, a, a), shear=0.1)
+    rcut = 2.5
+    expected = "direct" if natoms <= neighbors.DIRECT_MAX_ATOMS else "cells"
+    assert select_engine(x, Lattice(H), rcut) == expected
+    reference = brute_force(x, H, rcut)
+    for engine in ENGINES:
+        assert_same(search(x, H, rcut, engine), reference)
+
+
+@pytest.mark.parametrize("engine", ENGINES)
+@pytest.mark.parametrize("rcut", [2.0, 3.5, 6.0])
+def test_one_atom_cell(engine, rcut):
+    H = np.array([[2.5, 0.0, 0.0], [0.8, 2.7, 0.0], [0.3, 0.4, 3.1]])
+    x = np.array([[0.4, 0.7, 1.1]])
+    nn = search(x, H, rcut, engine)
+    assert_same(nn, brute_force(x, H, rcut))
+    assert (len(nn.bonds) > 0) == (rcut >= 2.5)
+
+
+@pytest.mark.parametrize("name", sorted(KERNELS))
+def test_kernel_parts_and_subset(name):
+    H, x = random_cell(2, 60, (8.0, 8.0, 8.0))
+    rcut = 3.0
+    whole = sorted(zip(*[np.concatenate(c).tolist() for c in zip(*KERNELS[name](x, H, rcut))]), key=str)
+    parts = []
+    for k in range(3):
+        for block in KERNELS[name](x, H, rcut, part=(k, 3)):
+            parts.extend(zip(*[c.tolist() for c in block]))
+    assert sorted(parts, key=str) == whole
+    subset = np.arange(0, len(x), 2)
+    some = [p for block in KERNELS[name](x, H, rcut, subset=subset) for p in zip(*[c.tolist() for c in block])]
+    assert sorted(some, key=str) == [p for p in whole if p[0] % 2 == 0]
+
+
+def test_fallback_cutoff_past_probe(monkeypatch):
+    # no gap in the spectrum and a first bond just inside the probe, the
+    # step that holds it ends past the probe
+    monkeypatch.setattr(neighbors, "first_shell_cutoff", lambda bonds, rmax: None)
+    monkeypatch.setattr(neighbors, "MAX_PROBE_PASSES", 1)
+    H = np.diag([2.0, 2.1, 2.15])
+    x = np.zeros((1, 3))
+    spacing = np.linalg.det(H) ** (1.0 / 3.0)
+    monkeypatch.setattr(neighbors, "PROBE_SCALE", 2.05 / spacing)
+
+    nn = search(x, H, 0, "auto")
+    assert nn.rcut > 2.05
+    assert_same(nn, brute_force(x, H, nn.rcut))
+    assert sorted(set(np.round(nn.bonds, 6))) == [2.0, 2.1, 2.15]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+
+# Parallel neighbor search against the serial search, and small cells that
+# must not start a pool.
+
+import os
+
+import numpy as np
+import pytest
+
+from vaspfileinspector import neighbors, parallel, reader
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+
+
+def supercell(n):
+    H, x, species, num_atoms, numbers = reader.read_vasp(BC8)
+    xs = np.dot(x, np.linalg.inv(H))
+    shifts = np.array([(a, b, c) for a in range(n) for b in range(n) for c in range(n)])
+    xs = ((xs[:, None, :] + shifts[None, :, :]) / float(n)).reshape(-1, 3)
+    Hn = np.asarray(H) * n
+    return Hn, np.dot(xs, Hn), list(np.repeat(species, len(shifts)))
+
+
+@pytest.fixture
+def cpus(monkeypatch):
+    monkeypatch.setattr(parallel, "available_cpus", lambda: 4)
+    monkeypatch.setattr(parallel, "_cost", {})
+    monkeypatch.setattr(parallel, "_overhead", {})
+
+    starts = []
+    start = parallel.ParallelSearch._start
+
+    def counted(self, x, H, jobs):
+        started = start(self, x, H, jobs)
+        starts.append(started)
+        return started
+
+    monkeypatch.setattr(parallel.ParallelSearch, "_start", counted)
+    return starts
+
+
+def same(a, b):
+    return all(np.array_equal(getattr(a, name), getattr(b, name))
+               for name in ("indicies", "neighbors", "bonds", "images"))
+
+
+@pytest.mark.parametrize("rcut", [0.0, 3.0])
+def test_small_cell_stays_serial(cpus, rcut):
+    H, x, species, num_atoms, numbers = reader.read_vasp(BC8)
+    nn = Neighbors(rcut, jobs=64)
+    nn.find(x, Lattice(H), species, rcut)
+    assert nn.parallel["serial"]
+    assert cpus == []
+
+
+@pytest.mark.parametrize("engine", ["direct", "cells"])
+@pytest.mark.parametrize("rcut", [0.0, 3.0])
+def test_same_as_serial(cpus, monkeypatch, engine, rcut):
+    # force the workers on a cell small enough for a test
+    monkeypatch.setattr(parallel, "SEARCH_COST", 1.0)
+    monkeypatch.setattr(parallel, "PART_MIN_ATOMS", 50)
+    # and a probe too short for the first shell, so it is widened
+    monkeypatch.setattr(neighbors, "PROBE_SCALE", 0.3)
+
+    H, x, species = supercell(3)
+    lattice = Lattice(H)
+    serial = Neighbors(rcut, engine=engine)
+    serial.find(x, lattice, species, rcut)
+    nn = Neighbors(rcut, engine=engine, jobs=2)
+    nn.find(x, lattice, species, rcut)
+
+    assert same(serial, nn)
+    assert not nn.parallel["serial"]
+    assert nn.parallel["parts"] > 1
+    # the probe passes of the automatic cutoff share one pool
+    assert nn.passes == serial.passes
+    assert nn.passes > 1 or rcut > 0
+    assert cpus.count(True) == 1
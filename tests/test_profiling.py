@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+
+# Neighbor search figures of the --profile report.
+
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+from vaspfileinspector.profiling import Profiler
+
+
+@pytest.fixture
+def profiler():
+    tracing = tracemalloc.is_tracing()
+    yield Profiler()
+    if not tracing:
+        tracemalloc.stop()
+
+
+def searched():
+    rng = np.random.default_rng(1)
+    H = np.diag([7.0, 8.0, 9.0])
+    x = np.dot(rng.random((40, 3)), H)
+    nn = Neighbors(3.0)
+    nn.find(x, Lattice(H), ["Si"] * len(x), 3.0)
+    return nn
+
+
+def test_rate_over_search_only(profiler):
+    nn = searched()
+    # the stage also holds the imports, far slower than the search
+    profiler.rows.append({"stage": "neighbors", "seconds": 100.0, "peak_mb": 0.0})
+    profiler.add_neighbors(nn)
+    report = profiler.extra["neighbors"]
+    assert not report["cached"]
+    assert report["passes"] == 1
+    assert report["pairs_per_second"] == pytest.approx(len(nn.bonds) / nn.seconds)
+
+
+def test_cached_list(profiler):
+    nn = searched()
+    nn.cached = True
+    profiler.add_neighbors(nn)
+    report = profiler.extra["neighbors"]
+    assert report["cached"]
+    assert report["passes"] == 0
+    assert report["pairs_per_second"] is None
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+
+# vfi serve rejects malformed requests and keeps serving.
+
+import json
+import socket
+
+import pytest
+
+from vaspfileinspector import server
+from vaspfileinspector.cache import MemoryCache
+
+BAD = [b"not json\n",
+       b"[1, 2]\n",
+       b'{"cwd": "/"}\n',
+       b'{"argv": "-a", "cwd": "/"}\n',
+       b'{"argv": ["-a", 3], "cwd": "/"}\n',
+       b'{"argv": ["--version"]}\n',
+       b'{"argv": ["--version"], "cwd": 7}\n']
+
+
+@pytest.mark.parametrize("line", BAD)
+def test_parse_request_rejects(line):
+    with pytest.raises(ValueError):
+        server.parse_request(line)
+
+
+def test_parse_request():
+    line = json.dumps({"argv": ["-a", "POSCAR"], "cwd": "/tmp"}).encode() + b'\n'
+    assert server.parse_request(line) == (["-a", "POSCAR"], "/tmp", "vfi")
+
+
+def ask(daemon, line):
+    client, conn = socket.socketpair()
+    with client:
+        client.sendall(line)
+        with conn:
+            daemon.handle(conn)
+        with client.makefile('rb') as f:
+            return list(server.read_frames(f))
+
+
+def test_daemon_answers_bad_requests(tmp_path):
+    daemon = server.Server(str(tmp_path / "vfi.sock"), MemoryCache(disk=False))
+    for line in BAD:
+        frames = ask(daemon, line)
+        assert frames[0][0] == server.STDERR
+        assert frames[-1] == (server.EXIT, json.dumps({"status": 2}).encode())
+    assert daemon.requests == 0
+
+    request = {"argv": ["--version"], "cwd": str(tmp_path)}
+    frames = ask(daemon, json.dumps(request).encode() + b'\n')
+    assert json.loads(frames[-1][1])["status"] == 0
+    assert b"0.3.0" in b"".join(p for k, p in frames if k == server.STDOUT)
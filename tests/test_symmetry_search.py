@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+
+# Symmetry reduced neighbor search against the full search on supercells
+# of BC8 silicon.
+
+import os
+
+import numpy as np
+import pytest
+import spglib
+
+from vaspfileinspector import reader
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+BC8 = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "BC8-mp.poscar")
+SYMPREC = 0.05
+
+
+def supercell(n):
+    H, x, species, num_atoms, numbers = reader.read_vasp(BC8)
+    xs = np.dot(x, np.linalg.inv(H))
+    shifts = np.array([(a, b, c) for a in range(n) for b in range(n) for c in range(n)])
+    xs = ((xs[:, None, :] + shifts[None, :, :]) / float(n)).reshape(-1, 3)
+    Hn = np.asarray(H) * n
+    return Hn, np.dot(xs, Hn), list(np.repeat(species, len(shifts))), np.repeat(numbers, len(shifts))
+
+
+def searches(H, x, species, dataset, rcut, engine):
+    lattice = Lattice(H)
+    full = Neighbors(rcut, engine=engine)
+    full.find(x, lattice, species, rcut)
+    reduced = Neighbors(rcut, engine=engine)
+    reduced.set_symmetry(dataset, SYMPREC)
+    reduced.find(x, lattice, species, rcut)
+    for name in ("indicies", "neighbors", "bonds", "images"):
+        assert np.array_equal(getattr(full, name), getattr(reduced, name)), name
+    return reduced
+
+
+@pytest.mark.parametrize("engine", ["direct", "cells"])
+@pytest.mark.parametrize("rcut", [0.0, 3.0, 5.0])
+@pytest.mark.parametrize("n", [1, 2, 3])
+def test_same_as_full_search(n, rcut, engine):
+    H, x, species, numbers = supercell(n)
+    dataset = spglib.get_symmetry_dataset((H, Lattice(H).to_fractional(x), numbers), SYMPREC)
+    reduced = searches(H, x, species, dataset, rcut, engine)
+    if n > 1:
+        assert reduced.unique < len(x)
+
+
+def test_falls_back_when_operations_do_not_fit():
+    H, x, species, numbers = supercell(2)
+    dataset = spglib.get_symmetry_dataset((H, Lattice(H).to_fractional(x), numbers), SYMPREC)
+    rng = np.random.default_rng(0)
+    x = x + rng.normal(0.0, 0.3, x.shape)
+    reduced = searches(H, x, species, dataset, 3.0, "cells")
+    assert reduced.unique == len(x)
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+
+# Neighbors.update() against a fresh Neighbors.find() on every frame of a
+# trajectory whose atoms wrap across the periodic boundary.
+
+import numpy as np
+import pytest
+
+from vaspfileinspector.lattice import Lattice
+from vaspfileinspector.neighbors import Neighbors
+
+
+def same(a, b):
+    return all(np.array_equal(getattr(a, name), getattr(b, name))
+               for name in ("indicies", "neighbors", "bonds", "images"))
+
+
+def fresh(x, lattice, species, rcut):
+    nn = Neighbors(rcut)
+    nn.find(x, lattice, species, rcut)
+    return nn
+
+
+def test_bond_across_boundary():
+    lattice = Lattice(np.eye(3) * 10.0)
+    species = ["Si", "Si"]
+    nn = Neighbors(2.5, skin=0.6)
+    for x in ([[0.1, 5.0, 5.0], [2.0, 5.0, 5.0]], [[9.9, 5.0, 5.0], [2.0, 5.0, 5.0]]):
+        x = np.array(x)
+        nn.update(x, lattice, species)
+        assert same(nn, fresh(x, lattice, species, 2.5))
+    assert nn.rebuilds == 1
+
+
+@pytest.mark.parametrize("natoms", [60, 300])
+def test_wrapping_trajectory(natoms):
+    rng = np.random.default_rng(natoms)
+    a = (natoms / 0.05) ** (1.0 / 3.0)
+    H = np.array([[a, 0.0, 0.0], [0.2 * a, a, 0.0], [0.1 * a, -0.15 * a, a]])
+    lattice = Lattice(H)
+    species = ["Si"] * natoms
+    xs = rng.random((natoms, 3))
+    nn = Neighbors(3.0, skin=0.6)
+    for frame in range(40):
+        x = np.dot(xs, H)
+        nn.update(x, lattice, species)
+        assert same(nn, fresh(x, lattice, species, 3.0)), "frame %i" % frame
+        xs = (xs + rng.normal(0.0, 0.05 / a, xs.shape)) % 1.0
+    assert nn.rebuilds < nn.frames